@@ -3,10 +3,21 @@ Policy violation detection engine.
 Checks activities against security policies and generates violation reports.
 """
 from typing import List, Dict, Any
+from bisect import bisect_right
+from itertools import accumulate
 from models import ViolationResult
 from config import settings
-import json
+import numpy as np
+import functools
+import orjson
 import os
+import re
+import threading
+
+try:
+    import ahocorasick
+except ImportError:  # C extension unavailable; fall back to the re module
+    ahocorasick = None
 
 
 # Suspicious domains that might indicate security risks
@@ -16,6 +27,171 @@ SUSPICIOUS_DOMAINS = [
 ]
 
 
+
+def _build_keyword_matcher(keywords: List[str]):
+    """
+    Build a function that scans a string for all keywords in a single pass.
+    
+    Uses an Aho-Corasick automaton when pyahocorasick is installed, otherwise
+    one precompiled regex alternation; both run the scan in C.
+    
+    Args:
+        keywords: Lowercase keywords to search for
+    
+    Returns:
+        Callable returning the first keyword found in a string, or None
+    """
+    keywords = [keyword for keyword in keywords if keyword]
+    if not keywords:
+        return lambda text: None  # An empty automaton cannot be searched
+    
+    if ahocorasick is not None:
+        automaton = _keyword_automaton(keywords)
+        
+        def match(text: str):
+            for end, length in automaton.iter(text):
+                return text[end - length + 1:end + 1]
+            return None
+        return match
+    
+    pattern = _keyword_pattern(keywords)
+    
+    def match(text: str):
+        found = pattern.search(text)
+        return found.group(0) if found else None
+    return match
+
+
+def _build_keyword_finder(keywords: List[str]):
+    """
+    Build a function that reports where keywords occur in a string, so one
+    scan can cover many strings joined together.
+    
+    Args:
+        keywords: Lowercase keywords to search for
+    
+    Returns:
+        Callable returning an iterable of match start offsets
+    """
+    keywords = [keyword for keyword in keywords if keyword]
+    if not keywords:
+        return lambda text: ()
+    
+    if ahocorasick is not None:
+        automaton = _keyword_automaton(keywords)
+        return lambda text: (end - length + 1 for end, length in automaton.iter(text))
+    
+    pattern = _keyword_pattern(keywords)
+    return lambda text: (found.start() for found in pattern.finditer(text))
+
+
+def _keyword_automaton(keywords: List[str]):
+    """
+    Build an Aho-Corasick automaton that stores only each keyword's length.
+    
+    STORE_LENGTH keeps the trie in packed C storage with no Python object per
+    keyword, which stays compact as keyword lists grow; a match's end offset
+    and length are enough to recover the keyword from the scanned text.
+    """
+    automaton = ahocorasick.Automaton(ahocorasick.STORE_LENGTH)
+    for keyword in keywords:
+        automaton.add_word(keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+def _keyword_pattern(keywords: List[str]):
+    """Compile keywords into a single regex alternation."""
+    return re.compile("|".join(re.escape(keyword) for keyword in keywords))
+
+
+# Marks a trie node where a complete blocked domain ends
+_TRIE_END = "$"
+
+
+def _build_domain_trie(domains) -> dict:
+    """
+    Build a trie of domains keyed on their labels in reverse order
+    (``www.example.com`` is stored as com -> example -> www).
+    
+    Args:
+        domains: Domain names to store
+    
+    Returns:
+        dict: Nested label dictionaries; _TRIE_END marks a stored domain
+    """
+    trie = {}
+    for domain in domains:
+        labels = domain.strip().lower().rstrip('.').split('.')
+        if not labels[-1]:
+            continue
+        node = trie
+        for label in reversed(labels):
+            node = node.setdefault(label, {})
+        node[_TRIE_END] = True
+    return trie
+
+
+def _domain_in_trie(trie: dict, domain: str) -> bool:
+    """
+    Check whether a domain or any of its parent domains is in the trie.
+    
+    Walks one label at a time from the TLD, so the cost depends on the
+    number of labels rather than on how many domains are stored.
+    
+    Args:
+        trie: Trie built by _build_domain_trie
+        domain: Lowercase domain name
+    
+    Returns:
+        bool: True if the domain is stored or is a subdomain of a stored domain
+    """
+    node = trie
+    for label in reversed(domain.rstrip('.').split('.')):
+        node = node.get(label)
+        if node is None:
+            return False
+        if _TRIE_END in node:
+            return True
+    return False
+
+
+# Finder over SUSPICIOUS_DOMAINS so all of a host's domains are checked
+# against every keyword in one scan
+_find_suspicious = _build_keyword_finder(SUSPICIOUS_DOMAINS)
+
+# Severity levels and their ranking, shared by every check
+SEVERITY_LOW = "low"
+SEVERITY_MEDIUM = "medium"
+SEVERITY_HIGH = "high"
+SEVERITY_CRITICAL = "critical"
+
+# Severities are tracked as integer ranks and only turned into a name once
+_RANK_LOW, _RANK_MEDIUM, _RANK_HIGH, _RANK_CRITICAL = range(4)
+_SEVERITY_BY_RANK = (SEVERITY_LOW, SEVERITY_MEDIUM, SEVERITY_HIGH, SEVERITY_CRITICAL)
+
+# Column order of the numeric metrics in vectorised threshold checks
+METRIC_COLUMNS = ("cpu_percent", "memory_percent", "disk_percent",
+                  "upload_rate_kbps", "download_rate_kbps", "active_connections")
+
+# Severity rank raised by each metric column when its threshold is exceeded
+_METRIC_RANKS = np.array(
+    [_RANK_MEDIUM, _RANK_MEDIUM, _RANK_MEDIUM, _RANK_HIGH, _RANK_MEDIUM, _RANK_MEDIUM],
+    dtype=np.uint8
+)
+
+# Metric columns in the order check_violations() reports them (connections first)
+_METRIC_REPORT_ORDER = (5, 0, 1, 2, 3, 4)
+
+# Shared result for the common no-violation case; callers must treat it as read-only
+_CLEAN_RESULT = ViolationResult(
+    violation=False,
+    reason=None,
+    severity=SEVERITY_LOW,
+    violated_processes=[]
+)
+
+
 class PolicyViolationDetector:
     """
     Detects policy violations based on process names, bandwidth usage, network destinations, and CPU usage.
@@ -24,14 +200,63 @@ class PolicyViolationDetector:
     
     def __init__(self):
         """Initialize the detector with all thresholds from configuration."""
-        self.blocked_keywords = [kw.strip().lower() for kw in settings.BLOCKED_KEYWORDS]
-        self.bandwidth_threshold_bytes = settings.BANDWIDTH_THRESHOLD_MB * 1024 * 1024
+        self.blocked_keywords = [kw.strip().lower() for kw in settings.BLOCKED_KEYWORDS if kw.strip()]
+        self._bandwidth_threshold_mb = settings.BANDWIDTH_THRESHOLD_MB
+        self.bandwidth_threshold_bytes = self._bandwidth_threshold_mb * 1024 * 1024
         self.cpu_threshold = settings.CPU_THRESHOLD_PERCENT
         self.memory_threshold = settings.MEMORY_THRESHOLD_PERCENT
         self.disk_threshold = settings.DISK_THRESHOLD_PERCENT
         self.max_connections = settings.CONNECTIONS_THRESHOLD
         self.upload_rate_threshold_kbps = settings.UPLOAD_RATE_THRESHOLD_MBPS * 1024
         self.download_rate_threshold_kbps = settings.DOWNLOAD_RATE_THRESHOLD_MBPS * 1024
+        
+        # Threshold parts of the violation messages never change, so format them once
+        self._bandwidth_msg_suffix = f" MB (limit: {self._bandwidth_threshold_mb:.0f} MB)"
+        self._connections_msg_suffix = f" active connections (limit: {self.max_connections})"
+        self._cpu_msg_suffix = f"% (threshold: {self.cpu_threshold}%)"
+        self._memory_msg_suffix = f"% (threshold: {self.memory_threshold}%)"
+        self._disk_msg_suffix = f"% (threshold: {self.disk_threshold}%)"
+        self._upload_msg_suffix = f" KB/s (threshold: {self.upload_rate_threshold_kbps/1024:.1f} MB/s)"
+        self._download_msg_suffix = f" KB/s (threshold: {self.download_rate_threshold_kbps/1024:.1f} MB/s)"
+        
+        # Thresholds in METRIC_COLUMNS order for comparing many hosts in one operation
+        self._metric_thresholds = np.array([
+            self.cpu_threshold,
+            self.memory_threshold,
+            self.disk_threshold,
+            self.upload_rate_threshold_kbps,
+            self.download_rate_threshold_kbps,
+            self.max_connections,
+        ], dtype=np.float64)
+        
+        # Message template per metric column for hosts flagged by a batch check
+        self._metric_messages = (
+            ("High CPU usage detected: {:.1f}", self._cpu_msg_suffix),
+            ("High memory usage detected: {:.1f}", self._memory_msg_suffix),
+            ("High disk usage detected: {:.1f}", self._disk_msg_suffix),
+            ("Excessive upload rate detected: {:.1f}", self._upload_msg_suffix),
+            ("Excessive download rate detected: {:.1f}", self._download_msg_suffix),
+            ("Excessive network connections detected: {:.0f}", self._connections_msg_suffix),
+        )
+        
+        # Build the keyword matcher once so each process name is matched
+        # against every blocked keyword in a single pass
+        self._kw_matcher = _build_keyword_matcher(self.blocked_keywords)
+        
+        # First characters of every keyword; a name sharing none of them
+        # cannot contain a keyword and skips the automaton entirely
+        self._kw_first_chars = frozenset(keyword[0] for keyword in self.blocked_keywords)
+        
+        # Process names repeat heavily within and across hosts (many chrome.exe
+        # entries), so remember recent verdicts per lowercase name
+        self._match_process = functools.lru_cache(maxsize=4096)(self._match_keyword)
+        
+        # Blocked domains from the policy file, reloaded only when it changes
+        self._blocked_domains_path = os.path.join(os.path.dirname(settings.DATABASE_PATH), "policies.json")
+        self._blocked_domain_trie = {}
+        self._blocked_domains_mtime = 0
+        self._blocked_domains_lock = threading.Lock()
+        self._refresh_blocked_domains()
     
     def check_violations(
         self, 
@@ -61,7 +286,7 @@ class PolicyViolationDetector:
         8. Excessive upload/download rates (potential data exfiltration)
         
         Args:
-            processes: List of running process names (should be lowercase)
+            processes: List of running process names (must already be lowercase)
             bytes_sent: Total bytes sent by the machine
             bytes_recv: Total bytes received by the machine
             hostname: Machine hostname (for logging purposes)
@@ -77,90 +302,234 @@ class PolicyViolationDetector:
             ViolationResult: Contains violation status, reason, and details
         """
         violations = []
-        max_severity = "low"
+        max_rank = _RANK_LOW
         violated_processes = []
         
-        # Check for blocked processes
-        process_violation = self._check_blocked_processes(processes)
-        if process_violation['violation']:
-            violations.append(process_violation['reason'])
-            violated_processes.extend(process_violation['violated_processes'])
-            max_severity = self._escalate_severity(max_severity, "high")
+        # Check for blocked processes (skipped entirely when no keywords are configured)
+        if self.blocked_keywords:
+            process_violation = self._check_blocked_processes(processes)
+            if process_violation['violation']:
+                violations.append(process_violation['reason'])
+                violated_processes.extend(process_violation['violated_processes'])
+                if _RANK_HIGH > max_rank:
+                    max_rank = _RANK_HIGH
         
         # Check for bandwidth violations
         bandwidth_violation = self._check_bandwidth_threshold(bytes_sent, bytes_recv)
         if bandwidth_violation['violation']:
             violations.append(bandwidth_violation['reason'])
-            max_severity = self._escalate_severity(max_severity, "medium")
+            if _RANK_MEDIUM > max_rank:
+                max_rank = _RANK_MEDIUM
         
         # Check for suspicious domains
         if destinations:
             domain_violation = self._check_suspicious_domains(destinations)
             if domain_violation['violation']:
                 violations.append(domain_violation['reason'])
-                max_severity = self._escalate_severity(max_severity, "high")
+                if _RANK_HIGH > max_rank:
+                    max_rank = _RANK_HIGH
         
         # Check for excessive connections
-        if destinations and len(destinations) > self.max_connections:
-            violations.append(f"Excessive network connections detected: {len(destinations)} active connections (limit: {self.max_connections})")
-            max_severity = self._escalate_severity(max_severity, "medium")
+        connection_count = len(destinations) if destinations else 0
+        if connection_count > self.max_connections:
+            violations.append(f"Excessive network connections detected: {connection_count}{self._connections_msg_suffix}")
+            if _RANK_MEDIUM > max_rank:
+                max_rank = _RANK_MEDIUM
         
         # Check for high CPU usage
         if cpu_percent is not None and cpu_percent > self.cpu_threshold:
-            violations.append(f"High CPU usage detected: {cpu_percent:.1f}% (threshold: {self.cpu_threshold}%)")
-            max_severity = self._escalate_severity(max_severity, "medium")
+            violations.append(f"High CPU usage detected: {cpu_percent:.1f}{self._cpu_msg_suffix}")
+            if _RANK_MEDIUM > max_rank:
+                max_rank = _RANK_MEDIUM
         
         # Check for high memory usage
         if memory_percent is not None and memory_percent > self.memory_threshold:
-            violations.append(f"High memory usage detected: {memory_percent:.1f}% (threshold: {self.memory_threshold}%)")
-            max_severity = self._escalate_severity(max_severity, "medium")
+            violations.append(f"High memory usage detected: {memory_percent:.1f}{self._memory_msg_suffix}")
+            if _RANK_MEDIUM > max_rank:
+                max_rank = _RANK_MEDIUM
         
         # Check for high disk usage
         if disk_percent is not None and disk_percent > self.disk_threshold:
-            violations.append(f"High disk usage detected: {disk_percent:.1f}% (threshold: {self.disk_threshold}%)")
-            max_severity = self._escalate_severity(max_severity, "medium")
+            violations.append(f"High disk usage detected: {disk_percent:.1f}{self._disk_msg_suffix}")
+            if _RANK_MEDIUM > max_rank:
+                max_rank = _RANK_MEDIUM
         
         # Check for excessive upload rate
         if upload_rate_kbps is not None and upload_rate_kbps > self.upload_rate_threshold_kbps:
-            violations.append(f"Excessive upload rate detected: {upload_rate_kbps:.1f} KB/s (threshold: {self.upload_rate_threshold_kbps/1024:.1f} MB/s)")
-            max_severity = self._escalate_severity(max_severity, "high")
+            violations.append(f"Excessive upload rate detected: {upload_rate_kbps:.1f}{self._upload_msg_suffix}")
+            if _RANK_HIGH > max_rank:
+                max_rank = _RANK_HIGH
         
         # Check for excessive download rate
         if download_rate_kbps is not None and download_rate_kbps > self.download_rate_threshold_kbps:
-            violations.append(f"Excessive download rate detected: {download_rate_kbps:.1f} KB/s (threshold: {self.download_rate_threshold_kbps/1024:.1f} MB/s)")
-            max_severity = self._escalate_severity(max_severity, "medium")
+            violations.append(f"Excessive download rate detected: {download_rate_kbps:.1f}{self._download_msg_suffix}")
+            if _RANK_MEDIUM > max_rank:
+                max_rank = _RANK_MEDIUM
+        
+        # Healthy hosts are the common case; skip building a new result for them
+        if not violations:
+            return _CLEAN_RESULT
         
         # Combine all violations
-        if violations:
-            return ViolationResult(
+        return ViolationResult(
+            violation=True,
+            reason="; ".join(violations),
+            severity=_SEVERITY_BY_RANK[max_rank],
+            violated_processes=violated_processes
+        )
+    
+    def check_violations_many(self, samples) -> List[ViolationResult]:
+        """
+        Check a batch of activity samples, comparing the numeric thresholds of
+        every sample in one vectorised pass.
+        
+        Gives the same results as calling check_violations() on each sample:
+        bandwidth and metric thresholds are evaluated as arrays, and only
+        flagged samples have messages built. Process and domain checks stay
+        per sample (they are string scans, already done in C).
+        
+        Args:
+            samples: ActivityRequest-like objects (processes, bytes_sent,
+                bytes_recv, destinations and the metric fields)
+        
+        Returns:
+            List of ViolationResult, one per sample in order
+        """
+        count = len(samples)
+        if not count:
+            return []
+        
+        def column(field):
+            return np.fromiter(
+                (np.nan if value is None else value for value in (getattr(sample, field) for sample in samples)),
+                dtype=np.float64,
+                count=count
+            )
+        
+        # Totals stay well below 2**53 bytes, so float64 compares them exactly
+        totals = np.fromiter((sample.bytes_sent + sample.bytes_recv for sample in samples), dtype=np.float64, count=count)
+        over_bandwidth = totals > self.bandwidth_threshold_bytes
+        
+        # check_violations() counts connections from the destinations list
+        connections = np.fromiter((len(sample.destinations or ()) for sample in samples), dtype=np.float64, count=count)
+        values = np.column_stack([
+            column('cpu_percent'),
+            column('memory_percent'),
+            column('disk_percent'),
+            column('upload_rate_kbps'),
+            column('download_rate_kbps'),
+            connections,
+        ])
+        ranks = np.where(self.metric_violation_mask(values), _METRIC_RANKS, 0).astype(np.uint8)
+        metric_flagged = ranks.any(axis=1)
+        
+        results = []
+        for index, sample in enumerate(samples):
+            violations = []
+            max_rank = _RANK_LOW
+            violated_processes = []
+            
+            if self.blocked_keywords:
+                process_violation = self._check_blocked_processes(sample.processes)
+                if process_violation['violation']:
+                    violations.append(process_violation['reason'])
+                    violated_processes.extend(process_violation['violated_processes'])
+                    max_rank = _RANK_HIGH
+            
+            if over_bandwidth[index]:
+                violations.append(self._check_bandwidth_threshold(sample.bytes_sent, sample.bytes_recv)['reason'])
+                if _RANK_MEDIUM > max_rank:
+                    max_rank = _RANK_MEDIUM
+            
+            if sample.destinations:
+                domain_violation = self._check_suspicious_domains(sample.destinations)
+                if domain_violation['violation']:
+                    violations.append(domain_violation['reason'])
+                    max_rank = _RANK_HIGH
+            
+            if metric_flagged[index]:
+                row, row_ranks = values[index], ranks[index]
+                for metric in _METRIC_REPORT_ORDER:
+                    if row_ranks[metric]:
+                        template, suffix = self._metric_messages[metric]
+                        violations.append(template.format(row[metric]) + suffix)
+                        if row_ranks[metric] > max_rank:
+                            max_rank = int(row_ranks[metric])
+            
+            if not violations:
+                results.append(_CLEAN_RESULT)
+                continue
+            
+            results.append(ViolationResult(
                 violation=True,
                 reason="; ".join(violations),
-                severity=max_severity,
+                severity=_SEVERITY_BY_RANK[max_rank],
                 violated_processes=violated_processes
-            )
-        else:
-            return ViolationResult(
-                violation=False,
-                reason=None,
-                severity="low",
-                violated_processes=[]
-            )
+            ))
+        
+        return results
+    
+    def metric_violation_mask(self, values: np.ndarray) -> np.ndarray:
+        """
+        Compare numeric metrics against their thresholds in one vectorised step.
+        
+        Args:
+            values: Array of shape (6,) or (hosts, 6) in METRIC_COLUMNS order;
+                missing readings should be NaN, which never exceeds a threshold
+        
+        Returns:
+            np.ndarray: Boolean mask of the same shape, True where a threshold is exceeded
+        """
+        return np.asarray(values, dtype=np.float64) > self._metric_thresholds
+    
+    def check_violations_batch(
+        self,
+        cpu_arr,
+        mem_arr,
+        disk_arr,
+        up_arr,
+        down_arr,
+        conn_arr
+    ) -> np.ndarray:
+        """
+        Check numeric thresholds for many hosts at once.
+        
+        Each argument is a sequence with one reading per host, in the same host
+        order; use NaN for readings a host did not report.
+        
+        Args:
+            cpu_arr: CPU usage percentages
+            mem_arr: Memory usage percentages
+            disk_arr: Disk usage percentages
+            up_arr: Upload rates in KB/s
+            down_arr: Download rates in KB/s
+            conn_arr: Active connection counts
+        
+        Returns:
+            np.ndarray: uint8 matrix of shape (hosts, 6) in METRIC_COLUMNS order
+                holding the severity rank of each exceeded threshold, 0 elsewhere.
+                Use ranks.any(axis=1) to find flagged hosts and
+                describe_metric_violations() to build their messages.
+        """
+        values = np.column_stack([cpu_arr, mem_arr, disk_arr, up_arr, down_arr, conn_arr]).astype(np.float64)
+        return np.where(self.metric_violation_mask(values), _METRIC_RANKS, 0).astype(np.uint8)
     
-    def _escalate_severity(self, current: str, new: str) -> str:
+    def describe_metric_violations(self, values) -> List[str]:
         """
-        Escalate severity level if new severity is higher.
+        Build violation messages for one host's metrics.
         
         Args:
-            current: Current severity level
-            new: New severity level to compare
+            values: The host's six readings in METRIC_COLUMNS order
         
         Returns:
-            Highest severity level
+            List of messages, one per exceeded threshold
         """
-        severity_order = {"low": 0, "medium": 1, "high": 2, "critical": 3}
-        if severity_order.get(new, 0) > severity_order.get(current, 0):
-            return new
-        return current
+        values = np.asarray(values, dtype=np.float64)
+        messages = []
+        for column in np.flatnonzero(self.metric_violation_mask(values)):
+            template, suffix = self._metric_messages[column]
+            messages.append(template.format(values[column]) + suffix)
+        return messages
     
     def _check_suspicious_domains(self, destinations: List[Dict[str, Any]]) -> dict:
         """
@@ -168,30 +537,38 @@ class PolicyViolationDetector:
         
         Args:
             destinations: List of network destinations with domain info
+                (domains must already be lowercase)
         
         Returns:
             dict: Violation status and details
         """
-        suspicious_found = []
-        
-        for dest in destinations:
-            domain = dest.get('domain', '').lower()
-            if domain:
-                for keyword in SUSPICIOUS_DOMAINS:
-                    if keyword in domain:
-                        suspicious_found.append(domain)
-                        break
-        
-        # Load blocked domains from policy
-        blocked_domains = self._load_blocked_domains()
-        for dest in destinations:
-            domain = dest.get('domain', '').lower()
-            if domain in blocked_domains:
-                suspicious_found.append(f"{domain} (blocked policy)")
+        # ActivityRequest already lowercased every domain
+        domains = [domain for domain in (dest.get('domain') for dest in destinations) if domain]
+        if not domains:
+            return {'violation': False, 'reason': None}
+        
+        # Scan all domains joined by newlines in one pass. No keyword contains a
+        # newline, so a match never spans two domains; each match offset is
+        # mapped back to its domain through the domains' start offsets.
+        starts = list(accumulate((len(domain) + 1 for domain in domains[:-1]), initial=0))
+        flagged = {bisect_right(starts, offset) - 1 for offset in _find_suspicious("\n".join(domains))}
+        
+        # Insertion-ordered dict deduplicates findings as they are added
+        suspicious_found = {}
+        blocked_domain_trie = self._refresh_blocked_domains()
+        
+        # Single pass over domains, collecting suspicious ones and those that
+        # are blocked (or subdomains of blocked ones) by policy
+        for index, domain in enumerate(domains):
+            if index in flagged:
+                suspicious_found[domain] = None
+            if blocked_domain_trie and _domain_in_trie(blocked_domain_trie, domain):
+                suspicious_found[f"{domain} (blocked policy)"] = None
         
         if suspicious_found:
-            domains_str = ", ".join(set(suspicious_found[:3]))  # Show first 3
-            count = len(set(suspicious_found))
+            items = list(suspicious_found)
+            domains_str = ", ".join(items[:3])  # Show first 3
+            count = len(items)
             return {
                 'violation': True,
                 'reason': f"Suspicious/blocked domain access detected: {domains_str}" + (f" (+{count-3} more)" if count > 3 else "")
@@ -199,36 +576,55 @@ class PolicyViolationDetector:
         
         return {'violation': False, 'reason': None}
     
-    def _load_blocked_domains(self) -> List[str]:
-        """Load blocked domains from policy file."""
-        policy_file = os.path.join(os.path.dirname(settings.DATABASE_PATH), "policies.json")
-        if os.path.exists(policy_file):
-            try:
-                with open(policy_file, 'r') as f:
-                    policies = json.load(f)
-                    return policies.get('blocked_domains', [])
-            except Exception:
-                return []
-        return []
+    def _refresh_blocked_domains(self) -> dict:
+        """
+        Return the blocked domain trie from the policy file, re-reading it only
+        when its modification time has changed since the last load.
+        
+        Returns:
+            dict: Reversed-label trie of blocked domains
+        """
+        try:
+            mtime = os.stat(self._blocked_domains_path).st_mtime
+        except OSError:
+            mtime = 0  # No policy file means no blocked domains
+        
+        if mtime == self._blocked_domains_mtime:
+            return self._blocked_domain_trie
+        
+        # Only one thread reloads; the trie is published before the mtime so a
+        # reader that sees the new mtime also sees the new trie
+        with self._blocked_domains_lock:
+            if mtime != self._blocked_domains_mtime:
+                blocked_domains = frozenset()
+                if mtime:
+                    try:
+                        with open(self._blocked_domains_path, 'rb') as f:
+                            policies = orjson.loads(f.read())
+                        blocked_domains = frozenset(policies.get('blocked_domains', []))
+                    except Exception:
+                        pass
+                self._blocked_domain_trie = _build_domain_trie(blocked_domains)
+                self._blocked_domains_mtime = mtime
+            return self._blocked_domain_trie
     
     def _check_blocked_processes(self, processes: List[str]) -> dict:
         """
         Check if any running process matches blocked keywords.
         
         Args:
-            processes: List of running process names (lowercase)
+            processes: List of running process names (must already be lowercase)
         
         Returns:
             dict: Violation status and details
         """
         violated_processes = []
         
+        # ActivityRequest already lowercases process names, so match them as-is
         for process in processes:
-            process_lower = process.lower()
-            for keyword in self.blocked_keywords:
-                if keyword in process_lower:
-                    violated_processes.append(process)
-                    break  # One match per process is enough
+            # One match per process is enough
+            if self._match_process(process):
+                violated_processes.append(process)
         
         if violated_processes:
             process_list = ", ".join(violated_processes)
@@ -244,6 +640,20 @@ class PolicyViolationDetector:
             'violated_processes': []
         }
     
+    def _match_keyword(self, text: str):
+        """
+        Return the first blocked keyword found in text, or None.
+        
+        Args:
+            text: Lowercase string to scan
+        
+        Returns:
+            Matched keyword or None
+        """
+        if self._kw_first_chars.isdisjoint(text):
+            return None
+        return self._kw_matcher(text)
+    
     def _check_bandwidth_threshold(self, bytes_sent: int, bytes_recv: int) -> dict:
         """
         Check if bandwidth usage exceeds the threshold.
@@ -259,11 +669,10 @@ class PolicyViolationDetector:
         
         if total_bandwidth > self.bandwidth_threshold_bytes:
             mb_used = total_bandwidth / (1024 * 1024)
-            mb_threshold = self.bandwidth_threshold_bytes / (1024 * 1024)
             
             return {
                 'violation': True,
-                'reason': f"Bandwidth threshold exceeded: {mb_used:.2f} MB (limit: {mb_threshold:.0f} MB)"
+                'reason': f"Bandwidth threshold exceeded: {mb_used:.2f}{self._bandwidth_msg_suffix}"
             }
         
         return {
@@ -281,8 +690,7 @@ class PolicyViolationDetector:
         Returns:
             bool: True if process is blocked, False otherwise
         """
-        process_lower = process_name.lower()
-        return any(keyword in process_lower for keyword in self.blocked_keywords)
+        return self._match_process(process_name.lower()) is not None
     
     def get_blocked_keywords(self) -> List[str]:
         """
@@ -300,7 +708,7 @@ class PolicyViolationDetector:
         Returns:
             Bandwidth threshold in MB
         """
-        return settings.BANDWIDTH_THRESHOLD_MB
+        return self._bandwidth_threshold_mb
 
 
 # Global detector instance
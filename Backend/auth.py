@@ -1,5 +1,16 @@
+import hashlib
+import hmac
+
 ADMIN_USERNAME = "admin"
-ADMIN_PASSWORD = "admin123"
+
+# Only a digest of the demo password is kept in memory
+_ADMIN_USERNAME_DIGEST = hashlib.sha256(ADMIN_USERNAME.encode()).digest()
+_ADMIN_PASSWORD_DIGEST = hashlib.sha256(b"admin123").digest()
 
 def authenticate(username, password):
-    return username == ADMIN_USERNAME and password == ADMIN_PASSWORD
+    # Digests are fixed-length, and compare_digest runs in constant time, so
+    # response timing reveals neither how much matched nor the secret's length;
+    # both fields are always checked
+    username_ok = hmac.compare_digest(hashlib.sha256(username.encode()).digest(), _ADMIN_USERNAME_DIGEST)
+    password_ok = hmac.compare_digest(hashlib.sha256(password.encode()).digest(), _ADMIN_PASSWORD_DIGEST)
+    return username_ok & password_ok
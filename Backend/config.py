@@ -18,6 +18,11 @@ class Settings:
     APP_VERSION: str = os.getenv("APP_VERSION", "1.0.0")
     DEBUG: bool = os.getenv("DEBUG", "True").lower() == "true"
     
+    # Server Settings
+    # Uvicorn worker processes when DEBUG is off (reload mode always runs one).
+    # Session-blocked domains and response caches are per process.
+    WORKERS: int = int(os.getenv("WORKERS", "1"))
+    
     # Database Settings
     DATABASE_PATH: str = os.getenv("DATABASE_PATH", "./monitoring.db")
     
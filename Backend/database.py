@@ -3,12 +3,313 @@ Database module for SQLite operations.
 Handles connection management, table creation, and database operations.
 """
 import sqlite3
-import json
+import orjson
+import atexit
+import os
+import queue
+import threading
+import time
+from urllib.parse import quote
 from datetime import datetime
 from typing import List, Dict, Any, Optional
+from concurrent.futures import Future
 from contextlib import contextmanager
 from config import settings
 
+# Statements on the agent hot paths. Reusing the same string objects lets
+# each connection's prepared-statement cache hit instead of re-parsing.
+_SQL_INSERT_ACTIVITY = """
+    INSERT INTO activities (
+        hostname, bytes_sent, bytes_recv, process_list, website_list,
+        destinations, agent_timestamp, open_tabs, cpu_percent, memory_percent,
+        disk_percent, active_connections, upload_rate_kbps, download_rate_kbps, timestamp,
+        timestamp_us
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_INSERT_ACTIVITY_PROCESS = """
+    INSERT OR IGNORE INTO activity_processes (activity_id, name) VALUES (?, ?)
+"""
+
+_SQL_INSERT_ACTIVITY_DESTINATION = """
+    INSERT OR IGNORE INTO activity_destinations (activity_id, target) VALUES (?, ?)
+"""
+
+_SQL_INSERT_ALERT = """
+    INSERT INTO alerts (hostname, reason, severity, activity_id, timestamp, timestamp_us)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_SQL_INSERT_COMMAND = """
+    INSERT INTO commands (student_id, action, domain, reason, status)
+    VALUES (?, ?, ?, ?, 'pending')
+"""
+
+_SQL_SELECT_PENDING_COMMANDS = """
+    SELECT id, student_id, action, domain, reason, created_at
+    FROM commands
+    WHERE student_id = ? AND status = 'pending'
+    ORDER BY created_at ASC
+"""
+
+_SQL_MARK_COMMAND_EXECUTED = """
+    UPDATE commands
+    SET status = 'executed', executed_at = datetime('now')
+    WHERE id = ?
+"""
+
+_SQL_CLAIM_PENDING_COMMANDS = """
+    UPDATE commands
+    SET status = 'executed', executed_at = datetime('now')
+    WHERE student_id = ? AND status = 'pending'
+"""
+
+_SQL_SELECT_RECENT_ACTIVITIES = """
+    SELECT id, hostname, bytes_sent, bytes_recv, process_list, website_list, destinations,
+           agent_timestamp, cpu_percent, memory_percent, disk_percent, active_connections,
+           upload_rate_kbps, download_rate_kbps, timestamp
+    FROM activities
+    ORDER BY timestamp DESC
+    LIMIT ?
+"""
+
+# One JSON object per recent activity row, serialized by SQLite
+_SQL_SELECT_RECENT_ACTIVITIES_JSON = """
+    SELECT json_object(
+        'id', id,
+        'hostname', hostname,
+        'bytes_sent', bytes_sent,
+        'bytes_recv', bytes_recv,
+        'process_list', CASE WHEN json_valid(process_list)
+                             THEN json(process_list) ELSE json('[]') END,
+        'website_list', CASE WHEN json_valid(website_list)
+                             THEN json(website_list) ELSE json('[]') END,
+        'destinations', CASE WHEN json_valid(destinations)
+                             THEN json(destinations) ELSE json('[]') END,
+        'agent_timestamp', agent_timestamp,
+        'cpu_percent', cpu_percent,
+        'memory_percent', memory_percent,
+        'disk_percent', disk_percent,
+        'active_connections', active_connections,
+        'upload_rate_kbps', upload_rate_kbps,
+        'download_rate_kbps', download_rate_kbps,
+        'timestamp', timestamp
+    )
+    FROM activities
+    ORDER BY timestamp DESC
+    LIMIT ?
+"""
+
+# /admin/logs rows: JSON columns are validated once in "recent", the sorted
+# website set is built in "shaped", and every list preview is a json_each
+# slice, so no row passes through Python
+_SQL_SELECT_ADMIN_LOGS_JSON = """
+    WITH recent AS (
+        SELECT id, hostname, bytes_sent, bytes_recv, timestamp,
+               coalesce(cpu_percent, 0) AS cpu,
+               coalesce(memory_percent, 0) AS memory,
+               coalesce(disk_percent, 0) AS disk,
+               coalesce(active_connections, 0) AS connections,
+               CASE WHEN json_valid(process_list) AND json_type(process_list) = 'array'
+                    THEN process_list ELSE '[]' END AS processes,
+               CASE WHEN json_valid(website_list) AND json_type(website_list) = 'array'
+                    THEN website_list ELSE '[]' END AS websites,
+               CASE WHEN json_valid(destinations) AND json_type(destinations) = 'array'
+                    THEN destinations ELSE '[]' END AS dests,
+               CASE WHEN json_valid(open_tabs) AND json_type(open_tabs) = 'array'
+                    THEN open_tabs ELSE '[]' END AS tabs
+        FROM activities
+        ORDER BY timestamp DESC
+        LIMIT ?
+    ),
+    shaped AS (
+        SELECT recent.*,
+               (SELECT json_group_array(site) FROM (
+                    SELECT value AS site FROM json_each(recent.websites)
+                    UNION
+                    SELECT json_extract(value, '$.domain') FROM json_each(recent.dests)
+                    WHERE type = 'object' AND json_extract(value, '$.domain') <> ''
+                    ORDER BY site
+               )) AS all_websites
+        FROM recent
+    )
+    SELECT json_group_array(json_object(
+        'student_id', hostname,
+        'hostname', hostname,
+        'cpu', round(cpu, 1),
+        'memory', round(memory, 1),
+        'disk', round(disk, 1),
+        'connections', connections,
+        'network', bytes_sent + bytes_recv,
+        'network_mb', round((bytes_sent + bytes_recv) / 1048576.0, 2),
+        'apps', (SELECT json_group_array(CASE WHEN atom IS NULL THEN json(value) ELSE value END)
+                 FROM (SELECT atom, value FROM json_each(processes) ORDER BY key LIMIT 5)),
+        'processes', json(processes),
+        'websites', (SELECT json_group_array(value)
+                     FROM (SELECT value FROM json_each(all_websites) ORDER BY key LIMIT 5)),
+        'all_websites', json(all_websites),
+        'destinations', (SELECT json_group_array(CASE WHEN atom IS NULL THEN json(value) ELSE value END)
+                         FROM (SELECT atom, value FROM json_each(dests) ORDER BY key LIMIT 5)),
+        'all_destinations', json(dests),
+        'open_tabs', json(tabs),
+        'bytes_sent', bytes_sent,
+        'bytes_recv', bytes_recv,
+        'timestamp', timestamp,
+        'raw_timestamp', timestamp,
+        'activity_id', id
+    ))
+    FROM shaped
+"""
+
+def _dumps(value: Any) -> str:
+    """
+    Serialize a value for a JSON TEXT column.
+    
+    Args:
+        value: JSON-serializable value
+    
+    Returns:
+        str: Compact JSON text
+    """
+    return orjson.dumps(value).decode()
+
+
+def _loads_list(value: Any) -> Any:
+    """
+    Decode a JSON TEXT column that holds a list.
+    
+    Args:
+        value: Column value (JSON text, an already-decoded list, or NULL)
+    
+    Returns:
+        The decoded value, or [] if it is missing or malformed
+    """
+    if isinstance(value, str):
+        try:
+            return orjson.loads(value)
+        except orjson.JSONDecodeError:
+            return []
+    if isinstance(value, list):
+        return value
+    return []
+
+
+def _epoch_us(moment: datetime) -> int:
+    """
+    Convert a naive local datetime to integer epoch microseconds.
+    
+    Args:
+        moment: Local datetime, as stored in the ISO timestamp columns
+    
+    Returns:
+        int: Microseconds since the Unix epoch
+    """
+    return int(moment.timestamp() * 1_000_000)
+
+
+# (epoch second, local ISO string for that second) reused by _now_stamp
+_second_cache = (None, "")
+
+
+def _now_stamp() -> tuple:
+    """
+    Current local ISO timestamp and epoch microseconds from one clock read.
+    
+    The ISO text matches datetime.now().isoformat(); its date and time part
+    is formatted once per wall-clock second and reused, with only the
+    microseconds appended per call.
+    
+    Returns:
+        tuple: (ISO timestamp string, epoch microseconds)
+    """
+    global _second_cache
+    now_us = time.time_ns() // 1000
+    second, micro = divmod(now_us, 1_000_000)
+    cached_second, prefix = _second_cache
+    if second != cached_second:
+        prefix = datetime.fromtimestamp(second).isoformat()
+        _second_cache = (second, prefix)
+    return (f"{prefix}.{micro:06d}" if micro else prefix), now_us
+
+
+def _cutoff_us(seconds: float) -> int:
+    """
+    Epoch microseconds for a point the given number of seconds ago.
+    
+    Args:
+        seconds: How far back the cutoff lies
+    
+    Returns:
+        int: Microseconds since the Unix epoch
+    """
+    return int((time.time() - seconds) * 1_000_000)
+
+
+# INSERT ... RETURNING (SQLite 3.35+) hands back the new id as the
+# statement's own result row; older libraries fall back to lastrowid
+_RETURNING_ID = " RETURNING id" if sqlite3.sqlite_version_info >= (3, 35, 0) else ""
+_SQL_INSERT_ACTIVITY_RETURNING = _SQL_INSERT_ACTIVITY + _RETURNING_ID
+_SQL_INSERT_ALERT_RETURNING = _SQL_INSERT_ALERT + _RETURNING_ID
+_SQL_INSERT_COMMAND_RETURNING = _SQL_INSERT_COMMAND + _RETURNING_ID
+_SQL_CLAIM_PENDING_COMMANDS_RETURNING = (
+    _SQL_CLAIM_PENDING_COMMANDS + " RETURNING id, action, domain, reason, created_at"
+)
+
+# Column order of the list queries below; rows are fetched as plain tuples
+# and zipped with these instead of going through sqlite3.Row
+_ALERT_KEYS = (
+    'id', 'hostname', 'reason', 'severity', 'status',
+    'timestamp', 'resolved_at', 'activity_id'
+)
+
+_ACTIVITY_KEYS = (
+    'id', 'hostname', 'bytes_sent', 'bytes_recv', 'process_list', 'website_list', 'destinations',
+    'agent_timestamp', 'cpu_percent', 'memory_percent', 'disk_percent', 'active_connections',
+    'upload_rate_kbps', 'download_rate_kbps', 'timestamp'
+)
+
+_COMMAND_KEYS = (
+    'id', 'student_id', 'action', 'domain', 'reason', 'status', 'created_at', 'executed_at'
+)
+
+# Columns added to activities after its first release, in migration order
+_ACTIVITY_MIGRATION_COLUMNS = (
+    ('website_list', 'TEXT'),
+    ('destinations', 'TEXT'),
+    ('cpu_percent', 'REAL'),
+    ('memory_percent', 'REAL'),
+    ('disk_percent', 'REAL'),
+    ('active_connections', 'INTEGER'),
+    ('upload_rate_kbps', 'REAL'),
+    ('download_rate_kbps', 'REAL'),
+    ('agent_timestamp', 'TEXT'),
+    ('open_tabs', 'TEXT'),
+)
+
+# PRAGMA user_version once every migration in init_database has been applied
+_SCHEMA_VERSION = 2
+
+# app_metadata key recording that allowed domains from a legacy
+# policies.json were imported (done at app startup, see import_legacy_policy_domains)
+_POLICY_IMPORT_KEY = "legacy_policy_import"
+
+# Size of each connection's prepared-statement cache
+_CACHED_STATEMENTS = 256
+
+# Idle connections kept per pool; extra connections are closed on check-in
+_POOL_SIZE = 8
+
+# Most queued writes the writer thread commits in one transaction
+_WRITE_BATCH_MAX = 500
+
+# Seconds a computed get_weekly_stats result is served before re-querying
+_WEEKLY_STATS_TTL = 5.0
+
+# Seconds a student's blocked-domain list is served from memory; queueing a
+# command for the student drops it sooner
+_BLOCKED_DOMAINS_TTL = 60.0
+
 
 class Database:
     """SQLite database manager for the monitoring system."""
@@ -21,27 +322,275 @@ class Database:
             db_path: Path to SQLite database file. Uses config default if not provided.
         """
         self.db_path = db_path or settings.DATABASE_PATH
+        
+        # Bounded pools of long-lived write and read-only connections, so the
+        # SQLite page cache stays warm instead of being rebuilt on every call.
+        # Connections are checked out per unit of work rather than pinned to
+        # threads, so idle threadpool workers that exit don't leak them.
+        self._write_pool: "queue.LifoQueue" = queue.LifoQueue(maxsize=_POOL_SIZE)
+        self._read_pool: "queue.LifoQueue" = queue.LifoQueue(maxsize=_POOL_SIZE)
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        atexit.register(self.close)
+        
+        # (result, expiry) for get_weekly_stats; dashboard polls within the
+        # TTL share one aggregation pass
+        self._weekly_cache = None
+        
+        # student_id -> (domains, expiry) for get_currently_blocked_domains.
+        # The generation is bumped on every invalidation, so a lookup that
+        # raced a new command doesn't store the list it read before it.
+        self._blocked_cache: Dict[str, tuple] = {}
+        self._blocked_generation = 0
+        self._blocked_lock = threading.Lock()
+        
+        self._enable_wal()
         self.init_database()
+        
+        # Agent ingest writes (activities, alerts) are funnelled through one
+        # writer thread that commits whatever has queued up as one transaction
+        self._write_q: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer = threading.Thread(
+            target=self._writer_loop, name="db-writer", daemon=True
+        )
+        self._writer.start()
+    
+    def _enable_wal(self):
+        """
+        Switch the database to write-ahead logging.
+        
+        WAL lets dashboard reads run alongside agent writes and avoids an
+        fsync of the main file on every commit. The journal mode is stored in
+        the database file, so this only has to succeed once.
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            if mode.lower() != "wal":
+                conn.execute("PRAGMA journal_mode=WAL")
+        finally:
+            conn.close()
+    
+    @staticmethod
+    def _configure_connection(conn: sqlite3.Connection):
+        """
+        Apply per-connection tuning pragmas.
+        
+        synchronous=NORMAL is safe with WAL (a crash can only lose the last
+        commits, never corrupt the file); the larger page cache, in-memory
+        temp storage and memory-mapped reads cut I/O for the aggregation
+        queries, and busy_timeout waits for a competing writer instead of
+        failing immediately with "database is locked".
+        """
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-64000")
+        conn.execute("PRAGMA mmap_size=268435456")
+    
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        """
+        Open and configure a long-lived connection.
+        
+        Connections run in autocommit mode; get_connection opens the explicit
+        transaction around each unit of work.
+        
+        Args:
+            read_only: Open the database with mode=ro
+        
+        Returns:
+            sqlite3.Connection: Configured connection
+        """
+        if read_only:
+            uri = f"file:{quote(os.path.abspath(self.db_path))}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   isolation_level=None, cached_statements=_CACHED_STATEMENTS)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   isolation_level=None, cached_statements=_CACHED_STATEMENTS)
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        self._configure_connection(conn)
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+    
+    def _checkout(self, pool: "queue.LifoQueue", read_only: bool = False) -> sqlite3.Connection:
+        """
+        Take the most recently used idle connection from a pool.
+        
+        Args:
+            pool: Pool to take from
+            read_only: Open a read-only connection if the pool is empty
+        
+        Returns:
+            sqlite3.Connection: Pooled or newly opened connection
+        """
+        try:
+            return pool.get_nowait()
+        except queue.Empty:
+            return self._connect(read_only=read_only)
+    
+    def _checkin(self, pool: "queue.LifoQueue", conn: sqlite3.Connection):
+        """
+        Return a connection to its pool, closing it if the pool is full.
+        
+        Args:
+            pool: Pool the connection was taken from
+            conn: Connection to return
+        """
+        try:
+            pool.put_nowait(conn)
+        except queue.Full:
+            with self._connections_lock:
+                if conn in self._connections:
+                    self._connections.remove(conn)
+            conn.close()
     
     @contextmanager
     def get_connection(self):
         """
         Context manager for database connections.
-        Ensures proper connection handling and cleanup.
+        
+        Yields a pooled write connection inside a BEGIN IMMEDIATE transaction
+        that is committed on success and rolled back on error. Nested use on
+        the same thread joins the outer transaction.
         
         Yields:
             sqlite3.Connection: Database connection object
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # Enable column access by name
+        local = self._local
+        conn = getattr(local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        
+        conn = local.conn = self._checkout(self._write_pool)
         try:
+            conn.execute("BEGIN IMMEDIATE")
             yield conn
-            conn.commit()
+            # Callers may already have committed explicitly
+            if conn.in_transaction:
+                conn.commit()
         except Exception as e:
-            conn.rollback()
+            if conn.in_transaction:
+                conn.rollback()
             raise e
         finally:
-            conn.close()
+            local.conn = None
+            self._checkin(self._write_pool, conn)
+    
+    @contextmanager
+    def get_read_connection(self):
+        """
+        Context manager for read-only queries.
+        
+        Yields a pooled read-only connection. With WAL it reads the last
+        committed state without waiting on writers.
+        
+        Yields:
+            sqlite3.Connection: Read-only database connection
+        """
+        conn = self._checkout(self._read_pool, read_only=True)
+        try:
+            yield conn
+        finally:
+            self._checkin(self._read_pool, conn)
+    
+    def _writer_loop(self):
+        """
+        Drain the write queue on a dedicated connection until stopped.
+        
+        Blocks for the first queued write, then takes everything else that
+        is already waiting (up to _WRITE_BATCH_MAX) and commits it together.
+        A lone write is committed immediately, so there is no added latency;
+        concurrent writers share one commit. A None item stops the loop.
+        """
+        conn = self._connect()
+        while True:
+            batch = [self._write_q.get()]
+            while len(batch) < _WRITE_BATCH_MAX:
+                try:
+                    batch.append(self._write_q.get_nowait())
+                except queue.Empty:
+                    break
+            
+            jobs = [job for job in batch if job is not None]
+            if jobs:
+                self._run_write_batch(conn, jobs)
+            if len(jobs) != len(batch):
+                return
+    
+    def _run_write_batch(self, conn: sqlite3.Connection, jobs: list):
+        """
+        Run queued writes in one BEGIN IMMEDIATE transaction.
+        
+        If the batch fails, each write is retried in its own transaction so
+        only the failing caller receives the error.
+        
+        Args:
+            conn: The writer thread's connection
+            jobs: List of (work, future) pairs; work takes a cursor
+        """
+        cursor = conn.cursor()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            results = [work(cursor) for work, _ in jobs]
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if len(jobs) > 1:
+                for job in jobs:
+                    self._run_write_batch(conn, [job])
+            else:
+                jobs[0][1].set_exception(e)
+            return
+        
+        for (_, future), result in zip(jobs, results):
+            future.set_result(result)
+    
+    def _submit_write(self, work):
+        """
+        Run a write on the writer thread and wait for it to commit.
+        
+        Args:
+            work: Callable taking a cursor and returning the write's result
+        
+        Returns:
+            The value returned by work
+        """
+        if not self._writer.is_alive():
+            # Writer already stopped (interpreter shutdown); write inline
+            with self.get_connection() as conn:
+                return work(conn.cursor())
+        
+        future = Future()
+        self._write_q.put((work, future))
+        return future.result()
+    
+    def close(self):
+        """Stop the writer thread and close every connection opened by this instance."""
+        writer = getattr(self, '_writer', None)
+        if writer is not None and writer.is_alive():
+            self._write_q.put(None)
+            writer.join(timeout=5)
+        
+        for pool in (self._write_pool, self._read_pool):
+            while True:
+                try:
+                    pool.get_nowait()
+                except queue.Empty:
+                    break
+        
+        with self._connections_lock:
+            for conn in self._connections:
+                try:
+                    conn.close()
+                except sqlite3.Error:
+                    pass
+            self._connections.clear()
+        self._local = threading.local()
     
     def init_database(self):
         """
@@ -63,6 +612,7 @@ class Database:
                     destinations TEXT,
                     agent_timestamp TEXT,
                     timestamp TEXT NOT NULL,
+                    timestamp_us INTEGER,
                     created_at TEXT NOT NULL DEFAULT (datetime('now'))
                 )
             """)
@@ -70,7 +620,9 @@ class Database:
             # Migrate existing tables - add new columns if they don't exist
             self._migrate_activities_table(cursor)
             
-            # Create index on hostname and timestamp for faster queries
+            # Create index on hostname and timestamp for faster queries.
+            # The recent-activity top-N walks idx_activities_timestamp
+            # backwards, so no separate DESC index is needed
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_activities_hostname 
                 ON activities(hostname)
@@ -91,6 +643,7 @@ class Database:
                     activity_id INTEGER,
                     status TEXT NOT NULL DEFAULT 'active',
                     timestamp TEXT NOT NULL,
+                    timestamp_us INTEGER,
                     resolved_at TEXT,
                     created_at TEXT NOT NULL DEFAULT (datetime('now')),
                     FOREIGN KEY (activity_id) REFERENCES activities (id)
@@ -108,6 +661,29 @@ class Database:
                 ON alerts(timestamp)
             """)
             
+            # Integer epoch-µs shadow of the ISO timestamps for range filters
+            self._migrate_timestamps_to_int(cursor)
+            
+            # hostname is included so get_active_students is answered from
+            # the index alone; it supersedes the single-column index
+            cursor.execute("DROP INDEX IF EXISTS idx_activities_timestamp_us")
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_activities_timestamp_us_hostname
+                ON activities(timestamp_us, hostname)
+            """)
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_alerts_timestamp_us
+                ON alerts(timestamp_us)
+            """)
+            
+            # Normalized process names and destinations per activity, so
+            # they can be filtered through an index instead of JSON text
+            self._create_activity_child_tables(cursor)
+            
+            # Per-host hourly bandwidth totals maintained by trigger
+            self._create_hourly_rollup(cursor)
+            
             # Create commands table for remote student control
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS commands (
@@ -127,6 +703,12 @@ class Database:
                 ON commands(student_id, status)
             """)
             
+            # Latest-action lookup per (student, domain) for blocked-domain state
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_commands_student_domain_time
+                ON commands(student_id, domain, created_at DESC)
+            """)
+            
             # Create scheduled_blocks table for time-based website blocking
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS scheduled_blocks (
@@ -169,8 +751,61 @@ class Database:
                 ON schedule_enforcement_status(updated_at)
             """)
             
+            # Windows Firewall rules created by the backend; rule names are
+            # short digests, so this maps each one back to what it blocks
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS firewall_rules (
+                    rule_name TEXT PRIMARY KEY,
+                    target TEXT NOT NULL,
+                    ip TEXT NOT NULL,
+                    reason TEXT,
+                    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+                )
+            """)
+            
+            cursor.execute("""
+                CREATE INDEX IF NOT EXISTS idx_firewall_rules_target
+                ON firewall_rules(target)
+            """)
+            
+            # Persistent domain policies (the allow list); the session-only
+            # block list stays in memory in routers/policy.py
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS domain_policies (
+                    domain TEXT PRIMARY KEY,
+                    policy TEXT NOT NULL,
+                    reason TEXT,
+                    added_by TEXT,
+                    created_at TEXT NOT NULL DEFAULT (datetime('now'))
+                )
+            """)
+            
+            # Markers for one-time startup steps, kept apart from PRAGMA user_version
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS app_metadata (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            
+            cursor.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            
             conn.commit()
     
+    @staticmethod
+    def _schema_is_current(cursor) -> bool:
+        """
+        Check whether the database is already at _SCHEMA_VERSION.
+        
+        Args:
+            cursor: Database cursor
+        
+        Returns:
+            bool: True if no column migration or backfill is needed
+        """
+        cursor.execute("PRAGMA user_version")
+        return cursor.fetchone()[0] >= _SCHEMA_VERSION
+    
     def _migrate_activities_table(self, cursor):
         """
         Migrate activities table to add new columns if they don't exist.
@@ -178,50 +813,215 @@ class Database:
         Args:
             cursor: Database cursor
         """
-        # Get existing columns
-        cursor.execute("PRAGMA table_info(activities)")
-        existing_columns = {row[1] for row in cursor.fetchall()}
+        # Nothing to do once init_database has stamped the current schema
+        if self._schema_is_current(cursor):
+            return
+        
+        # Add missing columns; an existing column fails with "duplicate column"
+        for column, column_type in _ACTIVITY_MIGRATION_COLUMNS:
+            try:
+                cursor.execute(f"ALTER TABLE activities ADD COLUMN {column} {column_type}")
+            except sqlite3.OperationalError as e:
+                if 'duplicate column' not in str(e):
+                    raise
+            else:
+                print(f"📦 Migrating database: Adding '{column}' column...")
+    
+    def _create_activity_child_tables(self, cursor):
+        """
+        Create the activity_processes and activity_destinations tables.
+        
+        The JSON columns on activities remain the record returned to
+        clients; these tables hold one row per distinct process name or
+        destination (domain, else IP) for indexed lookups. Tables created
+        on an existing database are backfilled from the JSON columns.
+        
+        Args:
+            cursor: Database cursor
+        """
+        cursor.execute("""
+            SELECT name FROM sqlite_master
+            WHERE type = 'table' AND name IN ('activity_processes', 'activity_destinations')
+        """)
+        existing_tables = {row[0] for row in cursor.fetchall()}
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS activity_processes (
+                activity_id INTEGER NOT NULL,
+                name TEXT NOT NULL,
+                PRIMARY KEY (activity_id, name)
+            ) WITHOUT ROWID
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_activity_processes_name
+            ON activity_processes(name)
+        """)
+        
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS activity_destinations (
+                activity_id INTEGER NOT NULL,
+                target TEXT NOT NULL,
+                PRIMARY KEY (activity_id, target)
+            ) WITHOUT ROWID
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_activity_destinations_target
+            ON activity_destinations(target)
+        """)
+        
+        if 'activity_processes' not in existing_tables:
+            cursor.execute("""
+                INSERT OR IGNORE INTO activity_processes (activity_id, name)
+                SELECT a.id, p.value
+                FROM activities a, json_each(a.process_list) p
+                WHERE json_valid(a.process_list) AND p.type = 'text'
+            """)
+        
+        if 'activity_destinations' not in existing_tables:
+            cursor.execute("""
+                INSERT OR IGNORE INTO activity_destinations (activity_id, target)
+                SELECT id, target FROM (
+                    SELECT a.id, COALESCE(
+                        NULLIF(json_extract(d.value, '$.domain'), ''),
+                        NULLIF(json_extract(d.value, '$.ip'), '')
+                    ) AS target
+                    FROM activities a, json_each(a.destinations) d
+                    WHERE json_valid(a.destinations) AND d.type = 'object'
+                )
+                WHERE target IS NOT NULL
+            """)
+    
+    def _create_hourly_rollup(self, cursor):
+        """
+        Create the hourly_stats rollup table and the trigger that feeds it.
+        
+        Every activity insert adds its bytes to the (hour, hostname) bucket,
+        so week-long aggregations read at most 7 * 24 rows per student
+        instead of every heartbeat. A newly created table is backfilled from
+        the existing activities.
         
-        # Add missing columns
-        if 'website_list' not in existing_columns:
-            print("📦 Migrating database: Adding 'website_list' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN website_list TEXT")
+        Args:
+            cursor: Database cursor
+        """
+        cursor.execute("""
+            SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'hourly_stats'
+        """)
+        is_new = cursor.fetchone() is None
         
-        if 'destinations' not in existing_columns:
-            print("📦 Migrating database: Adding 'destinations' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN destinations TEXT")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS hourly_stats (
+                hour INTEGER NOT NULL,
+                hostname TEXT NOT NULL,
+                sent INTEGER NOT NULL DEFAULT 0,
+                recv INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (hour, hostname)
+            ) WITHOUT ROWID
+        """)
         
-        if 'cpu_percent' not in existing_columns:
-            print("📦 Migrating database: Adding 'cpu_percent' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN cpu_percent REAL")
+        # hour = timestamp_us / 3600000000 (whole hours since the epoch)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS activities_hourly_rollup
+            AFTER INSERT ON activities
+            WHEN NEW.timestamp_us IS NOT NULL
+            BEGIN
+                INSERT INTO hourly_stats (hour, hostname, sent, recv)
+                VALUES (NEW.timestamp_us / 3600000000, NEW.hostname,
+                        NEW.bytes_sent, NEW.bytes_recv)
+                ON CONFLICT (hour, hostname) DO UPDATE SET
+                    sent = sent + excluded.sent,
+                    recv = recv + excluded.recv;
+            END
+        """)
         
-        if 'memory_percent' not in existing_columns:
-            print("📦 Migrating database: Adding 'memory_percent' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN memory_percent REAL")
+        if is_new:
+            cursor.execute("""
+                INSERT INTO hourly_stats (hour, hostname, sent, recv)
+                SELECT timestamp_us / 3600000000, hostname, SUM(bytes_sent), SUM(bytes_recv)
+                FROM activities
+                WHERE timestamp_us IS NOT NULL
+                GROUP BY 1, 2
+            """)
+    
+    @staticmethod
+    def _insert_returning_id(cursor, sql: str, params: tuple) -> int:
+        """
+        Run one of the *_RETURNING inserts and return the new row id.
         
-        if 'disk_percent' not in existing_columns:
-            print("📦 Migrating database: Adding 'disk_percent' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN disk_percent REAL")
+        Args:
+            cursor: Database cursor
+            sql: Insert statement, with RETURNING id when SQLite supports it
+            params: Statement parameters
         
-        if 'active_connections' not in existing_columns:
-            print("📦 Migrating database: Adding 'active_connections' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN active_connections INTEGER")
+        Returns:
+            int: ID of the inserted row
+        """
+        row = cursor.execute(sql, params).fetchone()
+        return row[0] if row else cursor.lastrowid
+    
+    @staticmethod
+    def _insert_activity_children(
+        cursor,
+        activity_id: int,
+        processes: List[str],
+        destinations: Optional[List[Dict[str, Any]]]
+    ):
+        """
+        Write the normalized process and destination rows for an activity.
         
-        if 'upload_rate_kbps' not in existing_columns:
-            print("📦 Migrating database: Adding 'upload_rate_kbps' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN upload_rate_kbps REAL")
+        Args:
+            cursor: Database cursor inside the activity's transaction
+            activity_id: ID of the inserted activity record
+            processes: List of running process names
+            destinations: List of network destinations (IP, port, domain)
+        """
+        # Heartbeat samples often carry no processes or destinations; skip
+        # the statement entirely rather than run it over an empty list
+        if processes:
+            cursor.executemany(
+                _SQL_INSERT_ACTIVITY_PROCESS,
+                [(activity_id, name) for name in processes if name]
+            )
+        if destinations:
+            targets = (d.get('domain') or d.get('ip') for d in destinations)
+            cursor.executemany(
+                _SQL_INSERT_ACTIVITY_DESTINATION,
+                [(activity_id, target) for target in targets if target]
+            )
+    
+    def _migrate_timestamps_to_int(self, cursor):
+        """
+        Add and backfill the timestamp_us columns on activities and alerts.
         
-        if 'download_rate_kbps' not in existing_columns:
-            print("📦 Migrating database: Adding 'download_rate_kbps' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN download_rate_kbps REAL")
+        The ISO text timestamps stay as the values returned to clients;
+        timestamp_us holds the same instant as epoch microseconds so time
+        windows are plain integer range scans on an index.
         
-        if 'agent_timestamp' not in existing_columns:
-            print("📦 Migrating database: Adding 'agent_timestamp' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN agent_timestamp TEXT")
+        Args:
+            cursor: Database cursor
+        """
+        if self._schema_is_current(cursor):
+            return
         
-        if 'open_tabs' not in existing_columns:
-            print("📦 Migrating database: Adding 'open_tabs' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN open_tabs TEXT")
+        for table in ('activities', 'alerts'):
+            cursor.execute(f"PRAGMA table_info({table})")
+            existing_columns = {row[1] for row in cursor.fetchall()}
+            if 'timestamp_us' not in existing_columns:
+                print(f"📦 Migrating database: Adding '{table}.timestamp_us' column...")
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN timestamp_us INTEGER")
+            
+            cursor.execute(f"SELECT id, timestamp FROM {table} WHERE timestamp_us IS NULL")
+            updates = []
+            for row_id, timestamp in cursor.fetchall():
+                try:
+                    updates.append((_epoch_us(datetime.fromisoformat(timestamp)), row_id))
+                except (TypeError, ValueError):
+                    continue  # Unparseable rows stay out of time windows
+            if updates:
+                cursor.executemany(
+                    f"UPDATE {table} SET timestamp_us = ? WHERE id = ?", updates
+                )
     
     def insert_activity(
         self, 
@@ -261,30 +1061,82 @@ class Database:
         Returns:
             int: ID of the inserted activity record
         """
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            timestamp = datetime.now().isoformat()  # Local system time (IST)
-            process_list_json = json.dumps(processes)
-            website_list_json = json.dumps(websites or [])
-            destinations_json = json.dumps(destinations or [])
-            open_tabs_json    = json.dumps(open_tabs or [])
-            
-            cursor.execute("""
-                INSERT INTO activities (
-                    hostname, bytes_sent, bytes_recv, process_list, website_list, 
-                    destinations, agent_timestamp, open_tabs, cpu_percent, memory_percent, 
-                    disk_percent, active_connections, upload_rate_kbps, download_rate_kbps, timestamp
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                hostname, bytes_sent, bytes_recv, process_list_json, website_list_json, 
-                destinations_json, agent_timestamp, open_tabs_json, cpu_percent, memory_percent, 
-                disk_percent, active_connections, upload_rate_kbps, download_rate_kbps, timestamp
-            ))
-            
-            return cursor.lastrowid
-    
+        timestamp, timestamp_us = _now_stamp()  # Local system time (IST)
+        process_list_json = _dumps(processes)
+        website_list_json = _dumps(websites or [])
+        destinations_json = _dumps(destinations or [])
+        open_tabs_json    = _dumps(open_tabs or [])
+        params = (
+            hostname, bytes_sent, bytes_recv, process_list_json, website_list_json, 
+            destinations_json, agent_timestamp, open_tabs_json, cpu_percent, memory_percent, 
+            disk_percent, active_connections, upload_rate_kbps, download_rate_kbps, timestamp,
+            timestamp_us
+        )
+        
+        def write(cursor):
+            activity_id = self._insert_returning_id(cursor, _SQL_INSERT_ACTIVITY_RETURNING, params)
+            self._insert_activity_children(cursor, activity_id, processes, destinations)
+            return activity_id
+        
+        return self._submit_write(write)
+
+    def insert_activities_many(self, activities: List[Dict[str, Any]]) -> List[int]:
+        """
+        Insert a batch of activity records in a single transaction.
+
+        Each item takes the same keys as the insert_activity arguments. The
+        whole batch is one write transaction, so it pays for a single journal
+        sync instead of one per heartbeat.
+
+        Args:
+            activities: List of activity dicts (hostname, bytes_sent, bytes_recv,
+                processes, and the optional insert_activity fields)
+
+        Returns:
+            List of inserted activity IDs, in input order
+        """
+        if not activities:
+            return []
+
+        timestamp, timestamp_us = _now_stamp()  # Local system time (IST)
+        rows = [
+            (
+                a['hostname'], a['bytes_sent'], a['bytes_recv'],
+                _dumps(a['processes']),
+                _dumps(a.get('websites') or []),
+                _dumps(a.get('destinations') or []),
+                a.get('agent_timestamp'),
+                _dumps(a.get('open_tabs') or []),
+                a.get('cpu_percent'), a.get('memory_percent'), a.get('disk_percent'),
+                a.get('active_connections'), a.get('upload_rate_kbps'),
+                a.get('download_rate_kbps'), timestamp, timestamp_us
+            )
+            for a in activities
+        ]
+
+        def write(cursor):
+            # Take each row's id from the insert itself; AUTOINCREMENT ids
+            # are not guaranteed to be consecutive within a batch
+            activity_ids = [
+                self._insert_returning_id(cursor, _SQL_INSERT_ACTIVITY_RETURNING, row)
+                for row in rows
+            ]
+            # Child rows for the whole batch go through one executemany per
+            # table rather than two statement runs per activity
+            process_rows = []
+            destination_rows = []
+            for activity_id, a in zip(activity_ids, activities):
+                process_rows.extend((activity_id, name) for name in a['processes'] if name)
+                targets = (d.get('domain') or d.get('ip') for d in a.get('destinations') or ())
+                destination_rows.extend((activity_id, target) for target in targets if target)
+            if process_rows:
+                cursor.executemany(_SQL_INSERT_ACTIVITY_PROCESS, process_rows)
+            if destination_rows:
+                cursor.executemany(_SQL_INSERT_ACTIVITY_DESTINATION, destination_rows)
+            return activity_ids
+
+        return self._submit_write(write)
+
     def insert_alert(
         self, 
         hostname: str, 
@@ -304,17 +1156,12 @@ class Database:
         Returns:
             int: ID of the inserted alert record
         """
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            timestamp = datetime.now().isoformat()  # Local system time
-            
-            cursor.execute("""
-                INSERT INTO alerts (hostname, reason, severity, activity_id, timestamp)
-                VALUES (?, ?, ?, ?, ?)
-            """, (hostname, reason, severity, activity_id, timestamp))
-            
-            return cursor.lastrowid
+        timestamp, timestamp_us = _now_stamp()  # Local system time
+        params = (hostname, reason, severity, activity_id, timestamp, timestamp_us)
+        
+        return self._submit_write(
+            lambda cursor: self._insert_returning_id(cursor, _SQL_INSERT_ALERT_RETURNING, params)
+        )
     
     def get_all_alerts(self) -> List[Dict[str, Any]]:
         """
@@ -323,8 +1170,9 @@ class Database:
         Returns:
             List of alert dictionaries with all fields
         """
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None
             cursor.execute("""
                 SELECT id, hostname, reason, severity, status, 
                        timestamp, resolved_at, activity_id
@@ -333,7 +1181,7 @@ class Database:
             """)
             
             rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            return [dict(zip(_ALERT_KEYS, row)) for row in rows]
     
     def get_active_alerts(self) -> List[Dict[str, Any]]:
         """
@@ -342,8 +1190,9 @@ class Database:
         Returns:
             List of active alert dictionaries
         """
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
+            cursor.row_factory = None
             cursor.execute("""
                 SELECT id, hostname, reason, severity, status, 
                        timestamp, resolved_at, activity_id
@@ -353,7 +1202,7 @@ class Database:
             """)
             
             rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            return [dict(zip(_ALERT_KEYS, row)) for row in rows]
     
     def resolve_alert(self, alert_id: int) -> bool:
         """
@@ -368,7 +1217,7 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
-            resolved_at = datetime.now().isoformat()  # Local system time
+            resolved_at = _now_stamp()[0]  # Local system time
             
             cursor.execute("""
                 UPDATE alerts
@@ -382,66 +1231,79 @@ class Database:
         """
         Calculate weekly statistics from activities and alerts.
         
+        Results are cached for _WEEKLY_STATS_TTL seconds; the 7-day window
+        barely moves between dashboard polls.
+        
         Returns:
             Dictionary containing weekly statistics
         """
-        with self.get_connection() as conn:
+        cached = self._weekly_cache
+        now = time.monotonic()
+        if cached is not None and now < cached[1]:
+            return cached[0]
+        
+        stats = self._compute_weekly_stats()
+        self._weekly_cache = (stats, now + _WEEKLY_STATS_TTL)
+        return stats
+    
+    def _compute_weekly_stats(self) -> Dict[str, Any]:
+        """
+        Run the weekly statistics queries.
+        
+        Returns:
+            Dictionary containing weekly statistics
+        """
+        cutoff = _cutoff_us(7 * 24 * 3600)
+        
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
             
-            # Get total bandwidth for the last 7 days
-            cursor.execute("""
-                SELECT 
-                    COALESCE(SUM(bytes_sent), 0) as total_sent,
-                    COALESCE(SUM(bytes_recv), 0) as total_recv,
-                    COUNT(DISTINCT hostname) as active_students
-                FROM activities
-                WHERE datetime(timestamp) >= datetime('now', '-7 days')
-            """)
-            
-            bandwidth_row = cursor.fetchone()
-            
-            # Get top bandwidth consumers
-            cursor.execute("""
-                SELECT 
-                    hostname,
-                    SUM(bytes_sent) as total_sent,
-                    SUM(bytes_recv) as total_recv,
-                    SUM(bytes_sent + bytes_recv) as total_bandwidth
-                FROM activities
-                WHERE datetime(timestamp) >= datetime('now', '-7 days')
-                GROUP BY hostname
-                ORDER BY total_bandwidth DESC
-                LIMIT 10
-            """)
-            
-            top_hosts = [dict(row) for row in cursor.fetchall()]
-            
-            # Get alert count for the last 7 days
-            cursor.execute("""
-                SELECT COUNT(*) as alert_count
-                FROM alerts
-                WHERE datetime(timestamp) >= datetime('now', '-7 days')
-            """)
-            
-            alert_row = cursor.fetchone()
-            
-            # Get alert breakdown by severity
+            # Per-host bandwidth and per-severity alert counts in one round
+            # trip; bandwidth comes from the hourly rollup (the window starts
+            # at the hour containing the cutoff) and the totals are derived below
             cursor.execute("""
-                SELECT severity, COUNT(*) as count
+                WITH per_host AS (
+                    SELECT 
+                        hostname,
+                        SUM(sent) as total_sent,
+                        SUM(recv) as total_recv
+                    FROM hourly_stats
+                    WHERE hour >= :cutoff / 3600000000
+                    GROUP BY hostname
+                )
+                SELECT 'host' as kind, hostname as name, total_sent, total_recv
+                FROM per_host
+                UNION ALL
+                SELECT 'alert' as kind, severity as name, COUNT(*), NULL
                 FROM alerts
-                WHERE datetime(timestamp) >= datetime('now', '-7 days')
+                WHERE timestamp_us >= :cutoff
                 GROUP BY severity
-            """)
+            """, {'cutoff': cutoff})
             
-            alerts_by_severity = {row['severity']: row['count'] for row in cursor.fetchall()}
+            hosts = []
+            alerts_by_severity = {}
+            for kind, name, first, second in cursor.fetchall():
+                if kind == 'host':
+                    hosts.append({
+                        'hostname': name,
+                        'total_sent': first,
+                        'total_recv': second,
+                        'total_bandwidth': first + second
+                    })
+                else:
+                    alerts_by_severity[name] = first
+            
+            total_sent = sum(host['total_sent'] for host in hosts)
+            total_recv = sum(host['total_recv'] for host in hosts)
+            hosts.sort(key=lambda host: host['total_bandwidth'], reverse=True)
             
             return {
-                'total_bytes_sent': bandwidth_row['total_sent'],
-                'total_bytes_recv': bandwidth_row['total_recv'],
-                'total_bandwidth': bandwidth_row['total_sent'] + bandwidth_row['total_recv'],
-                'active_students': bandwidth_row['active_students'],
-                'top_bandwidth_hosts': top_hosts,
-                'alert_count': alert_row['alert_count'],
+                'total_bytes_sent': total_sent,
+                'total_bytes_recv': total_recv,
+                'total_bandwidth': total_sent + total_recv,
+                'active_students': len(hosts),
+                'top_bandwidth_hosts': hosts[:10],
+                'alert_count': sum(alerts_by_severity.values()),
                 'alerts_by_severity': alerts_by_severity
             }
     
@@ -455,7 +1317,7 @@ class Database:
         Returns:
             Activity dictionary or None if not found
         """
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("""
                 SELECT id, hostname, bytes_sent, bytes_recv, process_list, timestamp
@@ -466,7 +1328,7 @@ class Database:
             row = cursor.fetchone()
             if row:
                 activity = dict(row)
-                activity['process_list'] = json.loads(activity['process_list'])
+                activity['process_list'] = orjson.loads(activity['process_list'])
                 return activity
             return None
 
@@ -480,59 +1342,65 @@ class Database:
         Returns:
             List of recent activity dictionaries
         """
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, hostname, bytes_sent, bytes_recv, process_list, website_list, destinations, 
-                       agent_timestamp, cpu_percent, memory_percent, disk_percent, active_connections,
-                       upload_rate_kbps, download_rate_kbps, timestamp
-                FROM activities
-                ORDER BY timestamp DESC
-                LIMIT ?
-            """, (limit,))
+            cursor.row_factory = None
+            cursor.execute(_SQL_SELECT_RECENT_ACTIVITIES, (limit,))
             
-            rows = cursor.fetchall()
+            # One batch fetch of exactly the rows requested
             activities = []
-            for row in rows:
-                activity = dict(row)
-                # Parse JSON fields safely with better error handling
-                try:
-                    process_list = activity.get('process_list', '[]')
-                    if isinstance(process_list, str):
-                        activity['process_list'] = json.loads(process_list)
-                    elif isinstance(process_list, list):
-                        activity['process_list'] = process_list
-                    else:
-                        activity['process_list'] = []
-                except (json.JSONDecodeError, TypeError):
-                    activity['process_list'] = []
-                
-                try:
-                    website_list = activity.get('website_list', '[]')
-                    if isinstance(website_list, str):
-                        activity['website_list'] = json.loads(website_list)
-                    elif isinstance(website_list, list):
-                        activity['website_list'] = website_list
-                    else:
-                        activity['website_list'] = []
-                except (json.JSONDecodeError, TypeError):
-                    activity['website_list'] = []
-                
-                try:
-                    destinations = activity.get('destinations', '[]')
-                    if isinstance(destinations, str):
-                        activity['destinations'] = json.loads(destinations)
-                    elif isinstance(destinations, list):
-                        activity['destinations'] = destinations
-                    else:
-                        activity['destinations'] = []
-                except (json.JSONDecodeError, TypeError):
-                    activity['destinations'] = []
-                
+            for row in cursor.fetchmany(limit):
+                activity = dict(zip(_ACTIVITY_KEYS, row))
+                # JSON columns: malformed or missing values become []
+                activity['process_list'] = _loads_list(row[4])
+                activity['website_list'] = _loads_list(row[5])
+                activity['destinations'] = _loads_list(row[6])
                 activities.append(activity)
             
             return activities
     
+    def get_recent_activities_json_bytes(self, limit: int = 50) -> bytes:
+        """
+        Retrieve recent activity records as a serialized JSON array.
+        
+        Same records as get_recent_activities, but SQLite's JSON1 functions
+        serialize each row, so the JSON columns are never parsed and
+        re-serialized in Python. The body is built before the read connection
+        goes back to the pool, so a client that disconnects mid-response never
+        holds a pooled connection. Malformed JSON columns become [].
+        
+        Args:
+            limit: Maximum number of records to return
+        
+        Returns:
+            bytes: UTF-8 encoded JSON array, newest first
+        """
+        with self.get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SQL_SELECT_RECENT_ACTIVITIES_JSON, (limit,))
+            rows = cursor.fetchall()
+        return ("[" + ",".join(row[0] for row in rows) + "]").encode('utf-8')
+    
+    def get_admin_logs_json_bytes(self, limit: int = 50) -> bytes:
+        """
+        Retrieve recent activity shaped for the admin dashboard as a JSON array.
+        
+        Each element is the /admin/logs row (rounded metrics, top apps,
+        de-duplicated websites, destination previews), built entirely by
+        SQLite's JSON1 functions so the body can be sent as-is. Malformed or
+        non-array JSON columns become [].
+        
+        Args:
+            limit: Maximum number of records to return
+        
+        Returns:
+            bytes: UTF-8 encoded JSON array, newest first
+        """
+        with self.get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(_SQL_SELECT_ADMIN_LOGS_JSON, (limit,))
+            return cursor.fetchone()[0].encode('utf-8')
+    
     def add_command(
         self,
         student_id: str,
@@ -552,13 +1420,15 @@ class Database:
         Returns:
             int: Command ID
         """
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO commands (student_id, action, domain, reason, status)
-                VALUES (?, ?, ?, ?, 'pending')
-            """, (student_id, action, domain, reason))
-            return cursor.lastrowid
+        params = (student_id, action, domain, reason)
+        
+        # Through the writer thread, so a burst of admin commands and auto-blocks
+        # shares commits with each other and with agent ingest
+        command_id = self._submit_write(
+            lambda cursor: self._insert_returning_id(cursor, _SQL_INSERT_COMMAND_RETURNING, params)
+        )
+        self._invalidate_blocked_domains([student_id])
+        return command_id
     
     def get_pending_commands(self, student_id: str) -> List[Dict[str, Any]]:
         """
@@ -570,14 +1440,9 @@ class Database:
         Returns:
             List of pending command dictionaries
         """
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, student_id, action, domain, reason, created_at
-                FROM commands
-                WHERE student_id = ? AND status = 'pending'
-                ORDER BY created_at ASC
-            """, (student_id,))
+            cursor.execute(_SQL_SELECT_PENDING_COMMANDS, (student_id,))
             
             rows = cursor.fetchall()
             return [dict(row) for row in rows]
@@ -594,64 +1459,143 @@ class Database:
         """
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                UPDATE commands
-                SET status = 'executed', executed_at = datetime('now')
-                WHERE id = ?
-            """, (command_id,))
+            cursor.execute(_SQL_MARK_COMMAND_EXECUTED, (command_id,))
             return cursor.rowcount > 0
     
-    def get_all_commands(self, limit: int = 100) -> List[Dict[str, Any]]:
+    def claim_pending_commands(self, student_id: str) -> List[Dict[str, Any]]:
         """
-        Get all commands for admin viewing.
+        Fetch a student's pending commands and mark them executed in one write.
+        
+        Claiming happens in a single transaction on the writer thread, so
+        concurrent polls from the same agent never deliver a command twice.
+        
+        Args:
+            student_id: Student hostname/ID
+        
+        Returns:
+            List of claimed command dictionaries (id, action, domain, reason),
+            oldest first
+        """
+        def claim(cursor):
+            if _RETURNING_ID:
+                rows = cursor.execute(_SQL_CLAIM_PENDING_COMMANDS_RETURNING, (student_id,)).fetchall()
+            else:
+                # No UPDATE ... RETURNING before SQLite 3.35; the writer thread
+                # runs nothing else between these two statements
+                rows = cursor.execute(_SQL_SELECT_PENDING_COMMANDS, (student_id,)).fetchall()
+                rows = [(row['id'], row['action'], row['domain'], row['reason'], row['created_at']) for row in rows]
+                cursor.execute(_SQL_CLAIM_PENDING_COMMANDS, (student_id,))
+            return rows
+        
+        rows = self._submit_write(claim)
+        # RETURNING yields rows in no particular order; agents apply them in sequence
+        rows = sorted(rows, key=lambda row: (row[4], row[0]))
+        return [
+            {'id': row[0], 'action': row[1], 'domain': row[2], 'reason': row[3]}
+            for row in rows
+        ]
+    
+    def get_all_commands(self, limit: int = 100, before: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Get all commands for admin viewing, newest first.
+        
+        Pages by id (keyset) rather than OFFSET: ids are assigned in insertion
+        order, so walking the primary key backwards yields newest-first rows
+        without scanning or sorting the rest of the table.
         
         Args:
             limit: Maximum number of commands to return
+            before: Only return commands with an id below this (the previous
+                page's last id); None starts from the newest command
         
         Returns:
             List of command dictionaries
         """
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                SELECT id, student_id, action, domain, reason, status, created_at, executed_at
-                FROM commands
-                ORDER BY created_at DESC
-                LIMIT ?
-            """, (limit,))
+            cursor.row_factory = None
+            if before is None:
+                cursor.execute("""
+                    SELECT id, student_id, action, domain, reason, status, created_at, executed_at
+                    FROM commands
+                    ORDER BY id DESC
+                    LIMIT ?
+                """, (limit,))
+            else:
+                cursor.execute("""
+                    SELECT id, student_id, action, domain, reason, status, created_at, executed_at
+                    FROM commands
+                    WHERE id < ?
+                    ORDER BY id DESC
+                    LIMIT ?
+                """, (before, limit))
             
             rows = cursor.fetchall()
-            return [dict(row) for row in rows]
+            return [dict(zip(_COMMAND_KEYS, row)) for row in rows]
 
 
     def get_currently_blocked_domains(self, student_id: str) -> list:
         """
         Returns a list of domains currently blocked for the student.
         A domain is considered blocked if the latest command for that domain is BLOCK_DOMAIN and not undone by a later UNBLOCK_DOMAIN.
+        
+        Lists are cached for _BLOCKED_DOMAINS_TTL seconds and dropped whenever a
+        command is queued for the student.
         """
-        with self.get_connection() as conn:
+        now = time.monotonic()
+        cached = self._blocked_cache.get(student_id)
+        if cached is not None and now < cached[1]:
+            return list(cached[0])
+        
+        generation = self._blocked_generation
+        domains = self._query_blocked_domains(student_id)
+        with self._blocked_lock:
+            if generation == self._blocked_generation:
+                self._blocked_cache[student_id] = (tuple(domains), now + _BLOCKED_DOMAINS_TTL)
+        return domains
+    
+    def _invalidate_blocked_domains(self, student_ids: Optional[List[str]] = None):
+        """
+        Drop cached blocked-domain lists after commands were queued.
+        
+        Args:
+            student_ids: Students whose lists changed; None drops every list
+        """
+        with self._blocked_lock:
+            self._blocked_generation += 1
+            if student_ids is None:
+                self._blocked_cache.clear()
+            else:
+                for student_id in student_ids:
+                    self._blocked_cache.pop(student_id, None)
+    
+    def _query_blocked_domains(self, student_id: str) -> List[str]:
+        """
+        Run the blocked-domains query for get_currently_blocked_domains.
+        
+        Args:
+            student_id: Student hostname/ID
+        
+        Returns:
+            List of currently blocked domains
+        """
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
-            # Get all commands for this student and domain, ordered by domain and created_at
+            # Latest command per domain in a single pass; id breaks ties
+            # between commands created within the same second
             cursor.execute('''
-                SELECT domain, action, MAX(created_at) as last_action_time
-                FROM commands
-                WHERE student_id = ? AND domain IS NOT NULL
-                GROUP BY domain
+                SELECT domain FROM (
+                    SELECT domain, action,
+                           ROW_NUMBER() OVER (
+                               PARTITION BY domain
+                               ORDER BY created_at DESC, id DESC
+                           ) AS rn
+                    FROM commands
+                    WHERE student_id = ? AND domain IS NOT NULL
+                )
+                WHERE rn = 1 AND action = 'BLOCK_DOMAIN'
             ''', (student_id,))
-            rows = cursor.fetchall()
-            blocked_domains = []
-            for row in rows:
-                domain = row[0]
-                # Find the latest action for this domain
-                cursor.execute('''
-                    SELECT action FROM commands
-                    WHERE student_id = ? AND domain = ?
-                    ORDER BY created_at DESC LIMIT 1
-                ''', (student_id, domain))
-                last_action = cursor.fetchone()
-                if last_action and last_action[0] == 'BLOCK_DOMAIN':
-                    blocked_domains.append(domain)
-            return blocked_domains
+            return [row[0] for row in cursor.fetchall()]
     
     def get_active_students(self, hours: int = 24) -> List[str]:
         """
@@ -663,18 +1607,43 @@ class Database:
         Returns:
             List of unique student hostnames
         """
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
+            # "+hostname" stops the planner from walking the whole hostname
+            # index to avoid a sort; the window is a covering range scan
             cursor.execute("""
                 SELECT DISTINCT hostname
                 FROM activities
-                WHERE datetime(timestamp) >= datetime('now', '-' || ? || ' hours')
-                ORDER BY hostname
-            """, (hours,))
+                WHERE timestamp_us >= ?
+                ORDER BY +hostname
+            """, (_cutoff_us(hours * 3600),))
             
             rows = cursor.fetchall()
             return [row[0] for row in rows]
     
+    def get_hosts_running_process(self, process_name: str, hours: int = 24) -> List[str]:
+        """
+        Get students that reported a given process within the specified hours.
+        
+        Args:
+            process_name: Exact process name (e.g. "chrome.exe")
+            hours: Number of hours to look back for activity
+        
+        Returns:
+            List of unique student hostnames
+        """
+        with self.get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT DISTINCT a.hostname
+                FROM activity_processes p
+                JOIN activities a ON a.id = p.activity_id
+                WHERE p.name = ? AND a.timestamp_us >= ?
+                ORDER BY a.hostname
+            """, (process_name, _cutoff_us(hours * 3600)))
+            
+            return [row[0] for row in cursor.fetchall()]
+    
     def create_global_command(
         self,
         action: str,
@@ -704,10 +1673,11 @@ class Database:
                 "students": []
             }
         
-        created_count = 0
-        for student in active_students:
-            self.add_command(student, action, domain, reason)
-            created_count += 1
+        # One executemany for the whole class, committed by the writer thread
+        rows = [(student, action, domain, reason) for student in active_students]
+        self._submit_write(lambda cursor: cursor.executemany(_SQL_INSERT_COMMAND, rows))
+        self._invalidate_blocked_domains(active_students)
+        created_count = len(active_students)
         
         return {
             "success": True,
@@ -718,6 +1688,194 @@ class Database:
             "domain": domain
         }
 
+    def record_firewall_rules(self, rules: List[tuple]):
+        """
+        Record firewall rules created by the backend.
+        
+        Args:
+            rules: (rule_name, target, ip, reason) tuples; target is the IP or
+                domain the admin blocked
+        """
+        rules = list(rules)
+        if rules:
+            self._submit_write(lambda cursor: cursor.executemany("""
+                INSERT OR REPLACE INTO firewall_rules (rule_name, target, ip, reason)
+                VALUES (?, ?, ?, ?)
+            """, rules))
+    
+    def get_firewall_rule_names(self, target: str) -> List[str]:
+        """
+        Get the names of recorded firewall rules for a blocked IP or domain.
+        
+        Args:
+            target: IP or domain that was blocked
+        
+        Returns:
+            List of rule names
+        """
+        with self.get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT rule_name FROM firewall_rules WHERE target = ?", (target,))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def delete_firewall_rules(self, rule_names: List[str]):
+        """
+        Forget firewall rules that were removed from the firewall.
+        
+        Args:
+            rule_names: Names of the removed rules
+        """
+        rows = [(name,) for name in rule_names]
+        if rows:
+            self._submit_write(
+                lambda cursor: cursor.executemany("DELETE FROM firewall_rules WHERE rule_name = ?", rows)
+            )
+    
+    def get_policy_domains(self, policy: str) -> List[str]:
+        """
+        Get the domains stored under a policy, in the order they were added.
+        
+        Args:
+            policy: Policy type, e.g. 'allowed'
+        
+        Returns:
+            List of domain names
+        """
+        with self.get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT domain FROM domain_policies WHERE policy = ? ORDER BY rowid", (policy,))
+            return [row[0] for row in cursor.fetchall()]
+    
+    def find_policy_domains(self, domains: List[str], policy: str) -> List[str]:
+        """
+        Get which of the given domains are stored under a policy.
+        
+        Args:
+            domains: Candidate domain names
+            policy: Policy type, e.g. 'allowed'
+        
+        Returns:
+            The stored subset of domains
+        """
+        if not domains:
+            return []
+        placeholders = ','.join('?' * len(domains))
+        with self.get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT domain FROM domain_policies WHERE policy = ? AND domain IN ({placeholders})",
+                (policy, *domains)
+            )
+            return [row[0] for row in cursor.fetchall()]
+    
+    def count_policy_domains(self, policy: str) -> int:
+        """
+        Count the domains stored under a policy.
+        
+        Args:
+            policy: Policy type, e.g. 'allowed'
+        
+        Returns:
+            Number of domains
+        """
+        with self.get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT COUNT(*) FROM domain_policies WHERE policy = ?", (policy,))
+            return cursor.fetchone()[0]
+    
+    def add_policy_domains(
+        self,
+        domains: List[str],
+        policy: str,
+        reason: str = "",
+        added_by: str = "admin"
+    ) -> int:
+        """
+        Store domains under a policy; domains already stored are left as they are.
+        
+        Args:
+            domains: Domain names
+            policy: Policy type, e.g. 'allowed'
+            reason: Reason for the policy
+            added_by: Admin who added the policy
+        
+        Returns:
+            Number of domains newly stored
+        """
+        rows = [(domain, policy, reason, added_by) for domain in domains]
+        if not rows:
+            return 0
+        
+        def insert(cursor):
+            cursor.executemany("""
+                INSERT OR IGNORE INTO domain_policies (domain, policy, reason, added_by)
+                VALUES (?, ?, ?, ?)
+            """, rows)
+            return cursor.rowcount
+        
+        return self._submit_write(insert)
+    
+    def legacy_policy_import_done(self) -> bool:
+        """
+        Check whether allowed domains from policies.json were already imported.
+        
+        Returns:
+            bool: True once import_legacy_policy_domains has run on this database
+        """
+        with self.get_read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM app_metadata WHERE key = ?", (_POLICY_IMPORT_KEY,))
+            return cursor.fetchone() is not None
+    
+    def import_legacy_policy_domains(self, domains: List[str]) -> Optional[int]:
+        """
+        Import allowed domains from a legacy policies.json, once per database.
+        
+        The import is recorded in app_metadata in the same transaction,
+        so domains an admin removes later are not imported again.
+        
+        Args:
+            domains: Normalized allowed domains read from the file
+        
+        Returns:
+            Number of domains newly stored, or None if the import already ran
+        """
+        rows = [(domain, "allowed", "Imported from policies.json", "admin") for domain in domains]
+        
+        def import_once(cursor):
+            cursor.execute(
+                "INSERT OR IGNORE INTO app_metadata (key, value) VALUES (?, datetime('now'))",
+                (_POLICY_IMPORT_KEY,)
+            )
+            if not cursor.rowcount:
+                return None
+            imported = 0
+            if rows:
+                cursor.executemany("""
+                    INSERT OR IGNORE INTO domain_policies (domain, policy, reason, added_by)
+                    VALUES (?, ?, ?, ?)
+                """, rows)
+                imported = cursor.rowcount
+            return imported
+        
+        return self._submit_write(import_once)
+    
+    def remove_policy_domain(self, domain: str) -> bool:
+        """
+        Remove a domain from the stored policies.
+        
+        Args:
+            domain: Domain name
+        
+        Returns:
+            bool: True if the domain was stored
+        """
+        def delete(cursor):
+            cursor.execute("DELETE FROM domain_policies WHERE domain = ?", (domain,))
+            return cursor.rowcount > 0
+        
+        return self._submit_write(delete)
+    
     def upsert_schedule_enforcement_status(
         self,
         student_id: str,
@@ -743,8 +1901,8 @@ class Database:
                 """,
                 (
                     student_id,
-                    json.dumps(active_domains or []),
-                    json.dumps(applied_domains or []),
+                    _dumps(active_domains or []),
+                    _dumps(applied_domains or []),
                     status,
                     last_error,
                 )
@@ -752,7 +1910,7 @@ class Database:
 
     def get_schedule_enforcement_statuses(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Return recent schedule enforcement states reported by student agents."""
-        with self.get_connection() as conn:
+        with self.get_read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
                 """
@@ -770,8 +1928,8 @@ class Database:
                 item = dict(row)
                 for field in ("active_domains", "applied_domains"):
                     try:
-                        item[field] = json.loads(item[field]) if item.get(field) else []
-                    except (json.JSONDecodeError, TypeError):
+                        item[field] = orjson.loads(item[field]) if item.get(field) else []
+                    except (orjson.JSONDecodeError, TypeError):
                         item[field] = []
                 statuses.append(item)
 
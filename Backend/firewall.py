@@ -1,15 +1,344 @@
+import hashlib
+import ipaddress
+import logging
+import os
+import queue
 import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 
-def block_ip(ip):
+try:
+    import pythoncom
+    import win32com.client
+except ImportError:  # pywin32 unavailable (or not Windows); fall back to netsh
+    pythoncom = None
+    win32com = None
+
+logger = logging.getLogger(__name__)
+
+# Prefix of every block rule created by the backend
+RULE_NAME_PREFIX = "Block:"
+
+# NET_FW_* values from the Windows Firewall API (netfw.h)
+_NET_FW_RULE_DIR_OUT = 2
+_NET_FW_ACTION_BLOCK = 0
+_NET_FW_PROFILE2_ALL = 0x7FFFFFFF
+
+
+def _quote(value):
+    """Quote a value for a netsh script line (netsh has no quote escaping)."""
+    return '"' + str(value).replace('"', "'") + '"'
+
+
+def check_remote_addresses(remote_ip):
     """
-    Blocks the given IP using Windows Firewall.
+    Check a remoteip value: one IP/CIDR, or a comma-separated list of them.
+
+    Rule changes go to netsh as script lines, so anything else (notably a
+    newline starting a second command) must never reach it.
+
+    Args:
+        remote_ip: Value for the rule's remote addresses
+
+    Raises:
+        ValueError: If any part is not an IP address or network
+    """
+    for part in str(remote_ip).split(','):
+        # ip_network also accepts surrounding whitespace; netsh does not
+        if part != part.strip():
+            raise ValueError(f"Invalid remote address: {remote_ip!r}")
+        ipaddress.ip_network(part, strict=False)
+
+
+def block_rule_name(target, ip, reason):
+    """
+    Build the firewall rule name for blocking one IP.
+
+    Names are a fixed-length digest instead of the target and free-text
+    reason, so they stay short for the firewall's name comparisons and carry
+    nothing user-supplied into netsh. The firewall_rules table maps each name
+    back to its target.
+
+    Args:
+        target: IP or domain the admin blocked
+        ip: IP address the rule blocks
+        reason: Reason for the block
+
+    Returns:
+        str: Rule name such as "Block:3f2a9c0d1e4b5a69"
+    """
+    digest = hashlib.blake2s(f"{target}\0{ip}\0{reason}".encode(), digest_size=8).hexdigest()
+    return RULE_NAME_PREFIX + digest
+
+
+def run_netsh_script(lines, timeout=30):
+    """
+    Runs netsh commands from one script file in a single netsh process.
+
+    Each rule costs a line in the script instead of a separate netsh
+    launch, so blocking many addresses pays the process startup once.
+
+    Args:
+        lines: netsh commands without the leading "netsh"
+        timeout: Seconds to wait for netsh
+
+    Returns:
+        subprocess.CompletedProcess with captured text output
+
+    Raises:
+        ValueError: If a command contains a line break, which netsh would
+            run as a separate command
+    """
+    lines = list(lines)
+    for line in lines:
+        if '\r' in line or '\n' in line:
+            raise ValueError(f"netsh command contains a line break: {line!r}")
+
+    fd, script_path = tempfile.mkstemp(suffix='.txt', text=True)
+    try:
+        with os.fdopen(fd, 'w') as script:
+            script.write('\n'.join(lines) + '\n')
+        return subprocess.run(
+            ['netsh', '-f', script_path],
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+    finally:
+        os.remove(script_path)
+
+
+class _ComFirewallWorker:
+    """
+    Dedicated thread holding the Windows Firewall COM policy (INetFwPolicy2).
+
+    COM objects are bound to the thread that created them, so every rule
+    change is queued to this one thread instead of spawning netsh.
+    """
+
+    def __init__(self):
+        self._jobs = queue.SimpleQueue()
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._policy_available = False
+
+    def available(self):
+        """
+        Start the worker on first use and report whether COM initialized.
+
+        Returns:
+            bool: True if rule changes can go through COM
+        """
+        if win32com is None:
+            return False
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="firewall-com", daemon=True
+                )
+                self._thread.start()
+        self._ready.wait()
+        return self._policy_available
+
+    def submit(self, work, timeout=30):
+        """
+        Run work on the worker thread and wait for its result.
+
+        Args:
+            work: Callable taking the INetFwPolicy2 object
+            timeout: Seconds to wait for the result
+
+        Returns:
+            The value returned by work
+
+        Raises:
+            subprocess.TimeoutExpired: If the call takes longer than timeout
+        """
+        future = Future()
+        self._jobs.put((work, future))
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            raise subprocess.TimeoutExpired('HNetCfg.FwPolicy2', timeout)
+
+    def _run(self):
+        """Initialize COM on this thread, then run queued jobs forever."""
+        try:
+            pythoncom.CoInitialize()
+            policy = win32com.client.Dispatch("HNetCfg.FwPolicy2")
+        except Exception as e:
+            logger.warning(f"Windows Firewall COM API unavailable, using netsh: {e}")
+            self._ready.set()
+            return
+
+        self._policy_available = True
+        self._ready.set()
+        while True:
+            work, future = self._jobs.get()
+            try:
+                future.set_result(work(policy))
+            except Exception as e:
+                future.set_exception(e)
+
+
+_com_worker = _ComFirewallWorker()
+
+
+def _com_add_block_rules(policy, rules):
+    """
+    Adds outbound block rules through INetFwPolicy2 (worker thread only).
+
+    Args:
+        policy: HNetCfg.FwPolicy2 dispatch object
+        rules: List of (rule_name, remote_ip) pairs
+
+    Returns:
+        subprocess.CompletedProcess shaped like the netsh result, with one
+        stderr line per rule that failed
+    """
+    errors = []
+    for name, ip in rules:
+        rule = win32com.client.Dispatch("HNetCfg.FWRule")
+        rule.Name = name
+        rule.Direction = _NET_FW_RULE_DIR_OUT
+        rule.Action = _NET_FW_ACTION_BLOCK
+        rule.RemoteAddresses = ip
+        rule.Profiles = _NET_FW_PROFILE2_ALL
+        rule.Enabled = True
+        try:
+            policy.Rules.Add(rule)
+        except pythoncom.com_error as e:
+            # strerror carries the system text, e.g. "Access is denied."
+            errors.append(f"{ip}: {e.strerror}")
+    return subprocess.CompletedProcess(
+        args=['HNetCfg.FwPolicy2'],
+        returncode=1 if errors else 0,
+        stdout='',
+        stderr='\n'.join(errors)
+    )
+
+
+def add_block_rules(rules, timeout=30):
+    """
+    Adds outbound block rules.
     MUST run as Administrator.
+
+    Rules are added in-process through the Windows Firewall COM API when
+    pywin32 is installed, otherwise in one netsh invocation.
+
+    Args:
+        rules: Iterable of (rule_name, remote_ip) pairs
+
+    Returns:
+        subprocess.CompletedProcess with captured text output
+
+    Raises:
+        ValueError: If a remote_ip is not an IP/CIDR (or a comma-separated
+            list of them)
     """
-    command = (
-        'netsh advfirewall firewall add rule '
-        f'name="Block {ip}" '
-        'dir=out action=block '
-        f'remoteip={ip}'
+    rules = list(rules)
+    for _, ip in rules:
+        check_remote_addresses(ip)
+    if _com_worker.available():
+        return _com_worker.submit(lambda policy: _com_add_block_rules(policy, rules), timeout=timeout)
+    return run_netsh_script(
+        [
+            f'advfirewall firewall add rule name={_quote(name)} '
+            f'dir=out action=block remoteip={ip}'
+            for name, ip in rules
+        ],
+        timeout=timeout
     )
 
-    subprocess.run(command, shell=True)
+
+def _com_list_block_rules(policy):
+    """
+    Reads outbound block rules from INetFwPolicy2 (worker thread only).
+
+    Args:
+        policy: HNetCfg.FwPolicy2 dispatch object
+
+    Returns:
+        List of (rule_name, remote_addresses) pairs
+    """
+    rules = []
+    for rule in policy.Rules:
+        # Check the name first so unrelated rules cost one property read
+        name = rule.Name
+        if 'Block' in name and rule.Direction == _NET_FW_RULE_DIR_OUT:
+            rules.append((name, rule.RemoteAddresses))
+    return rules
+
+
+def list_block_rules(timeout=15):
+    """
+    Lists outbound firewall rules with "Block" in their name.
+
+    Rules are read in-process through the Windows Firewall COM API when
+    pywin32 is installed, otherwise parsed from netsh's rule listing.
+
+    Args:
+        timeout: Seconds to wait for the listing
+
+    Returns:
+        List of (rule_name, remote_addresses) pairs
+
+    Raises:
+        subprocess.CalledProcessError: If netsh fails to list the rules
+        subprocess.TimeoutExpired: If the listing takes longer than timeout
+    """
+    if _com_worker.available():
+        return _com_worker.submit(_com_list_block_rules, timeout=timeout)
+
+    command = ['netsh', 'advfirewall', 'firewall', 'show', 'rule', 'name=all', 'dir=out']
+    result = subprocess.run(command, capture_output=True, text=True, timeout=timeout)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, command, result.stdout, result.stderr)
+
+    rules = []
+    rule_name = None
+    for line in result.stdout.splitlines():
+        line = line.strip()
+        if line.startswith('Rule Name:'):
+            rule_name = line.split(':', 1)[1].strip()
+            if 'Block' not in rule_name:
+                rule_name = None
+        elif line.startswith('RemoteIP:') and rule_name is not None:
+            rules.append((rule_name, line.split(':', 1)[1].strip()))
+            rule_name = None
+    return rules
+
+
+def delete_rules(rule_names, timeout=30):
+    """
+    Deletes firewall rules by name in one netsh invocation.
+    MUST run as Administrator.
+
+    Args:
+        rule_names: Iterable of rule names
+
+    Returns:
+        subprocess.CompletedProcess with captured text output
+    """
+    return run_netsh_script(
+        [f'advfirewall firewall delete rule name={_quote(name)}' for name in rule_names],
+        timeout=timeout
+    )
+
+
+def block_ips(ips):
+    """
+    Blocks the given IPs using Windows Firewall.
+    MUST run as Administrator.
+    """
+    return add_block_rules((f"Block {ip}", ip) for ip in ips)
+
+
+def block_ip(ip):
+    """
+    Blocks the given IP using Windows Firewall.
+    MUST run as Administrator.
+    """
+    return block_ips([ip])
@@ -5,31 +5,43 @@ Department Network Monitoring and Cybersecurity Dashboard Backend.
 This is a legal, admin-controlled monitoring system for college network management.
 """
 from fastapi import FastAPI, Request, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse, Response
 from contextlib import asynccontextmanager
+import atexit
 import logging
-import json
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener
+import orjson
 from datetime import datetime
 
 from config import settings
 from database import db
-from models import HealthCheckResponse, ErrorResponse
+from models import HealthCheckResponse
 
 # Import routers
 from routers import activity, alerts, stats
 from routers.firewall import router as firewall_router
 from routers.auth import router as auth_router
-from routers.policy import router as policy_router
+from routers.policy import router as policy_router, import_policy_file
 from routers.commands import router as commands_router
 from routers.reports_analytics import router as reports_analytics_router
 from routers.schedule import router as schedule_router
+from routers.admin import router as admin_router
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: request handlers only enqueue records on the root
+# logger; formatting and console I/O happen on the listener's thread
+_log_queue = queue.SimpleQueue()
+_log_handler = logging.StreamHandler()
+_log_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_root_logger = logging.getLogger()
+_root_logger.handlers = [QueueHandler(_log_queue)]
+_root_logger.setLevel(logging.INFO)
+_log_listener = QueueListener(_log_queue, _log_handler, respect_handler_level=True)
+_log_listener.start()
+atexit.register(_log_listener.stop)  # Flush queued records on exit
 logger = logging.getLogger(__name__)
 
 
@@ -44,6 +56,9 @@ async def lifespan(app: FastAPI):
     
     # Database is already initialized in database.py, but we can log confirmation
     logger.info("Database initialized successfully")
+    
+    # One-time move of a legacy policies.json allow list into the database
+    await run_in_threadpool(import_policy_file)
     logger.info(f"Blocked keywords: {', '.join(settings.BLOCKED_KEYWORDS)}")
     logger.info(f"Policy Thresholds:")
     logger.info(f"  - Bandwidth: {settings.BANDWIDTH_THRESHOLD_MB} MB")
@@ -104,6 +119,7 @@ app = FastAPI(
     """,
     version=settings.APP_VERSION,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,  # orjson encodes responses in C
     docs_url="/docs",
     redoc_url="/redoc"
 )
@@ -127,17 +143,49 @@ async def global_exception_handler(request: Request, exc: Exception):
     """
     logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
-        content=ErrorResponse(
-            error=True,
-            message="Internal server error",
-            detail=str(exc) if settings.DEBUG else "An unexpected error occurred",
-            timestamp=datetime.now().isoformat()
-        ).model_dump()
+        content={
+            "error": True,
+            "message": "Internal server error",
+            "detail": str(exc) if settings.DEBUG else "An unexpected error occurred",
+            "timestamp": datetime.now().isoformat()
+        }
     )
 
 
+# Static part of the health-check payload; only the timestamp changes
+_HEALTH_PAYLOAD = {
+    "status": "healthy",
+    "service": settings.APP_NAME,
+    "version": settings.APP_VERSION
+}
+
+# (epoch second, serialized payload) reused for every poll within that second
+_health_cache = (None, b"")
+
+
+def _health_response() -> Response:
+    """
+    Build the health-check response, re-serializing at most once per second.
+    
+    Returning a Response directly skips the response_model validation pass.
+    
+    Returns:
+        Response: Serialized HealthCheckResponse payload
+    """
+    global _health_cache
+    second = int(time.time())
+    cached_second, body = _health_cache
+    if second != cached_second:
+        body = orjson.dumps({
+            **_HEALTH_PAYLOAD,
+            "timestamp": datetime.fromtimestamp(second).isoformat()
+        })
+        _health_cache = (second, body)
+    return Response(content=body, media_type="application/json")
+
+
 # Health check endpoint
 @app.get(
     "/",
@@ -146,19 +194,14 @@ async def global_exception_handler(request: Request, exc: Exception):
     summary="Health check",
     description="Check if the API is running and healthy"
 )
-async def health_check() -> HealthCheckResponse:
+async def health_check() -> Response:
     """
     Root endpoint - Health check.
     
     Returns:
         HealthCheckResponse: Service status and information
     """
-    return HealthCheckResponse(
-        status="healthy",
-        service=settings.APP_NAME,
-        version=settings.APP_VERSION,
-        timestamp=datetime.now().isoformat()
-    )
+    return _health_response()
 
 
 @app.get(
@@ -168,271 +211,14 @@ async def health_check() -> HealthCheckResponse:
     summary="Health check (alternate)",
     description="Alternate health check endpoint"
 )
-async def health_check_alternate() -> HealthCheckResponse:
+async def health_check_alternate() -> Response:
     """
     Alternate health check endpoint.
     
     Returns:
         HealthCheckResponse: Service status and information
     """
-    return HealthCheckResponse(
-        status="healthy",
-        service=settings.APP_NAME,
-        version=settings.APP_VERSION,
-        timestamp=datetime.now().isoformat()
-    )
-
-
-# 📡 Admin endpoint for fetching student activity logs
-@app.get(
-    "/admin/logs",
-    tags=["Admin"],
-    summary="Get student activity logs",
-    description="Retrieve recent student activity data for admin dashboard monitoring"
-)
-async def get_student_logs():
-    """
-    Get recent student activity logs for admin dashboard.
-    
-    Returns:
-        List of recent activity records with formatted data
-    """
-    try:
-        # Get recent activities from database
-        recent_activities = db.get_recent_activities(limit=50)
-        
-        # Format data for frontend display
-        formatted_logs = []
-        for activity in recent_activities:
-            # Calculate total network usage
-            total_network = activity['bytes_sent'] + activity['bytes_recv']
-            
-            # Get top processes (limit to 5 for display) - Handle both string and list types
-            process_list = activity.get('process_list', [])
-            if isinstance(process_list, str):
-                try:
-                    process_list = json.loads(process_list)
-                except (json.JSONDecodeError, TypeError):
-                    process_list = []
-            elif not isinstance(process_list, list):
-                process_list = []
-            top_apps = process_list[:5]
-            
-            # Get websites/destinations - Handle both string and list types
-            website_list = activity.get('website_list', [])
-            if isinstance(website_list, str):
-                try:
-                    website_list = json.loads(website_list)
-                except (json.JSONDecodeError, TypeError):
-                    website_list = []
-            elif not isinstance(website_list, list):
-                website_list = []
-                
-            destinations_data = activity.get('destinations', [])
-            if isinstance(destinations_data, str):
-                try:
-                    destinations_data = json.loads(destinations_data)
-                except (json.JSONDecodeError, TypeError):
-                    destinations_data = []
-            elif not isinstance(destinations_data, list):
-                destinations_data = []
-            
-            # Extract unique domains from destinations; keep raw objects for modal
-            all_websites = set(website_list)
-            for dest in destinations_data:
-                domain = dest.get('domain')
-                if domain:
-                    all_websites.add(domain)
-            # raw destination objects (with domain, ip, port) for the modal
-            all_destinations = destinations_data
-            
-            # Get open_tabs (currently open browser tabs)
-            open_tabs_data = activity.get('open_tabs', [])
-            if isinstance(open_tabs_data, str):
-                try:
-                    open_tabs_data = json.loads(open_tabs_data)
-                except (json.JSONDecodeError, TypeError):
-                    open_tabs_data = []
-            elif not isinstance(open_tabs_data, list):
-                open_tabs_data = []
-
-            # Get CPU percentage
-            cpu_percent = activity.get('cpu_percent', 0) or 0
-            
-            # Get memory, disk, connections
-            memory_percent = activity.get('memory_percent', 0) or 0
-            disk_percent = activity.get('disk_percent', 0) or 0
-            active_connections = activity.get('active_connections', 0) or 0
-            
-            all_websites_list = sorted(all_websites)
-            formatted_logs.append({
-                "student_id": activity['hostname'],
-                "hostname": activity['hostname'],
-                "cpu": round(cpu_percent, 1),
-                "memory": round(memory_percent, 1),
-                "disk": round(disk_percent, 1),
-                "connections": active_connections,
-                "network": total_network,
-                "network_mb": round(total_network / (1024 * 1024), 2),
-                "apps": top_apps,
-                "processes": process_list,
-                "websites": all_websites_list[:5],       # preview (5 items)
-                "all_websites": all_websites_list,        # all for modal
-                "destinations": destinations_data[:5],    # preview (5 items)
-                "all_destinations": all_destinations,     # all for modal
-                "open_tabs": open_tabs_data,              # currently open browser tabs
-                "bytes_sent": activity['bytes_sent'],
-                "bytes_recv": activity['bytes_recv'],
-                "timestamp": activity['timestamp'],
-                "raw_timestamp": activity['timestamp'],
-                "activity_id": activity['id']
-            })
-        
-        return formatted_logs
-        
-    except Exception as e:
-        logger.error(f"Error fetching admin logs: {str(e)}")
-        # Include the actual error in response for debugging
-        return [
-            {
-                "error": f"Database error: {str(e)}",
-                "hostname": "ERROR", 
-                "cpu": 0,
-                "memory": 0, 
-                "disk": 0,
-                "network": 0,
-                "network_mb": 0,
-                "bytes_sent": 0,
-                "bytes_recv": 0,
-                "apps": [],
-                "processes": [],
-                "websites": [],
-                "destinations": [],
-                "timestamp": datetime.now().isoformat(),
-                "raw_timestamp": datetime.now().isoformat(),
-                "activity_id": 0
-            }
-        ]
-
-
-@app.post(
-    "/admin/block-domain",
-    tags=["Admin"],
-    summary="Block domain on student machine",
-    description="Admin endpoint to remotely block a website on a specific student laptop"
-)
-async def block_domain_on_student(request: dict):
-    """
-    Issue a block command for a student machine.
-    The student agent will poll and execute this command locally.
-    
-    Request body:
-    {
-        "student_id": "STUDENT-PC-001",
-        "domain": "youtube.com",
-        "reason": "Unauthorized access"
-    }
-    
-    Returns:
-        Success confirmation
-    """
-    try:
-        student_id = request.get('student_id')
-        domain = request.get('domain')
-        reason = request.get('reason', 'Admin policy violation')
-        
-        if not student_id or not domain:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="student_id and domain are required"
-            )
-        
-        # Add command to queue
-        command_id = db.add_command(
-            student_id=student_id,
-            action="BLOCK_DOMAIN",
-            domain=domain,
-            reason=reason
-        )
-        
-        logger.info(f"Admin issued BLOCK command: {domain} for student {student_id}")
-        
-        return {
-            "success": True,
-            "message": f"Block command issued for {domain} on {student_id}",
-            "command_id": command_id,
-            "student_id": student_id,
-            "domain": domain
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error issuing block command: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to issue block command: {str(e)}"
-        )
-
-
-@app.post(
-    "/admin/unblock-domain",
-    tags=["Admin"],
-    summary="Unblock domain on student machine",
-    description="Admin endpoint to remotely unblock a website on a specific student laptop"
-)
-async def unblock_domain_on_student(request: dict):
-    """
-    Issue an unblock command for a student machine.
-    The student agent will poll and execute this command locally.
-    
-    Request body:
-    {
-        "student_id": "STUDENT-PC-001",
-        "domain": "youtube.com",
-        "reason": "Access restored"
-    }
-    
-    Returns:
-        Success confirmation
-    """
-    try:
-        student_id = request.get('student_id')
-        domain = request.get('domain')
-        reason = request.get('reason', 'Admin unblock request')
-        
-        if not student_id or not domain:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="student_id and domain are required"
-            )
-        
-        # Add command to queue
-        command_id = db.add_command(
-            student_id=student_id,
-            action="UNBLOCK_DOMAIN",
-            domain=domain,
-            reason=reason
-        )
-        
-        logger.info(f"Admin issued UNBLOCK command: {domain} for student {student_id}")
-        
-        return {
-            "success": True,
-            "message": f"Unblock command issued for {domain} on {student_id}",
-            "command_id": command_id,
-            "student_id": student_id,
-            "domain": domain
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error issuing unblock command: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to issue unblock command: {str(e)}"
-        )
+    return _health_response()
 
 
 # Include routers
@@ -445,66 +231,7 @@ app.include_router(policy_router)
 app.include_router(commands_router)
 app.include_router(reports_analytics_router)
 app.include_router(schedule_router)
-
-
-@app.post(
-    "/admin/test-blocked-processes",
-    tags=["Admin"],
-    summary="Test student with blocked processes",
-    description="Simulate a student with blocked processes to test auto-blocking functionality"
-)
-async def test_blocked_processes():
-    """
-    Create a test activity submission with blocked processes to test auto-blocking.
-    
-    This will trigger the policy violation detection and auto-blocking functionality.
-    
-    Returns:
-        Success confirmation
-    """
-    try:
-        from routers.activity import submit_activity
-        from models import ActivityRequest
-        
-        # Create test activity with blocked processes
-        test_activity = ActivityRequest(
-            hostname="TEST-STUDENT-PC",
-            timestamp=datetime.now().isoformat(),
-            bytes_sent=1024000,
-            bytes_recv=2048000,
-            cpu_percent=45.2,
-            memory_percent=65.3,
-            disk_percent=55.1,
-            active_connections=25,
-            upload_rate_kbps=150.5,
-            download_rate_kbps=800.2,
-            processes=["chrome.exe", "torrent.exe", "proxy-tool.exe", "nmap.exe", "notepad.exe"],  # Contains blocked keywords
-            websites=["google.com", "thepiratebay.org", "facebook.com"],
-            destinations=[
-                {"ip": "142.250.191.14", "port": 443, "domain": "google.com"},
-                {"ip": "185.8.156.2", "port": 443, "domain": "thepiratebay.org"},
-                {"ip": "157.240.22.35", "port": 443, "domain": "facebook.com"}
-            ]
-        )
-        
-        # Submit the test activity
-        result = await submit_activity(test_activity)
-        
-        return {
-            "success": True,
-            "message": "Test activity with blocked processes submitted",
-            "activity_id": result.activity_id,
-            "violation_detected": result.violation_detected,
-            "alert_id": result.alert_id,
-            "test_processes": test_activity.processes
-        }
-        
-    except Exception as e:
-        logger.error(f"Error creating test activity: {str(e)}")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to create test activity: {str(e)}"
-        )
+app.include_router(admin_router)
 
 
 # For debugging: Log all registered routes
@@ -520,7 +247,10 @@ if __name__ == "__main__":
     import uvicorn
     
     logger.info(f"Starting {settings.APP_NAME} v{settings.APP_VERSION}")
-    logger.info("Running in development mode with auto-reload")
+    if settings.DEBUG:
+        logger.info("Running in development mode with auto-reload")
+    else:
+        logger.info(f"Running in production mode with {settings.WORKERS} worker(s)")
     
     # Log routes on startup
     import asyncio
@@ -531,5 +261,9 @@ if __name__ == "__main__":
         host="0.0.0.0",
         port=8001,
         reload=settings.DEBUG,
+        workers=1 if settings.DEBUG else settings.WORKERS,
+        # loop/http default to "auto": uvloop and httptools from uvicorn[standard]
+        # when available (uvloop has no Windows build, where asyncio is used)
+        access_log=settings.DEBUG,  # per-request access lines only while debugging
         log_level="info"
     )
@@ -7,6 +7,13 @@ import os
 
 DB_PATH = "monitoring.db"
 
+# Columns this script adds to activities if they are missing
+MIGRATION_COLUMNS = (
+    ('website_list', 'TEXT'),
+    ('destinations', 'TEXT'),
+    ('agent_timestamp', 'TEXT'),
+)
+
 def migrate():
     """Add missing columns to activities table."""
     
@@ -14,10 +21,18 @@ def migrate():
         print(f"❌ Database not found at {DB_PATH}")
         return
     
-    conn = sqlite3.connect(DB_PATH)
+    # Autocommit mode, so the explicit BEGIN below controls the transaction
+    conn = sqlite3.connect(DB_PATH, isolation_level=None)
     cursor = conn.cursor()
     
     try:
+        # Same journal settings as the running server (database.py)
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        
+        # All ALTERs commit together: one sync, and no half-migrated schema
+        cursor.execute("BEGIN IMMEDIATE")
+        
         # Get existing columns
         cursor.execute("PRAGMA table_info(activities)")
         existing_columns = {row[1] for row in cursor.fetchall()}
@@ -27,20 +42,11 @@ def migrate():
         # Add missing columns
         columns_added = []
         
-        if 'website_list' not in existing_columns:
-            print("📦 Adding 'website_list' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN website_list TEXT")
-            columns_added.append('website_list')
-        
-        if 'destinations' not in existing_columns:
-            print("📦 Adding 'destinations' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN destinations TEXT")
-            columns_added.append('destinations')
-        
-        if 'agent_timestamp' not in existing_columns:
-            print("📦 Adding 'agent_timestamp' column...")
-            cursor.execute("ALTER TABLE activities ADD COLUMN agent_timestamp TEXT")
-            columns_added.append('agent_timestamp')
+        for column, column_type in MIGRATION_COLUMNS:
+            if column not in existing_columns:
+                print(f"📦 Adding '{column}' column...")
+                cursor.execute(f"ALTER TABLE activities ADD COLUMN {column} {column_type}")
+                columns_added.append(column)
         
         conn.commit()
         
@@ -56,7 +62,8 @@ def migrate():
         
     except Exception as e:
         print(f"❌ Migration failed: {e}")
-        conn.rollback()
+        if conn.in_transaction:
+            conn.rollback()
     finally:
         conn.close()
 
@@ -5,12 +5,30 @@ Defines the data structures for all API endpoints.
 from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
+import functools
 
 
 # ============================================================================
 # ACTIVITY MODELS
 # ============================================================================
 
+@functools.lru_cache(maxsize=16384)
+def _normalize_name(value: str) -> str:
+    """
+    Strip and lowercase a process or website name.
+    
+    Agents resend mostly the same names on every heartbeat, so repeats are a
+    cache hit and share one normalized string.
+    
+    Args:
+        value: Name as sent by the agent
+    
+    Returns:
+        str: Normalized name ('' if it was only whitespace)
+    """
+    return value.strip().lower()
+
+
 class ActivityRequest(BaseModel):
     """
     Request model for student activity data submission.
@@ -101,7 +119,7 @@ class ActivityRequest(BaseModel):
     @classmethod
     def validate_processes(cls, v: List[str]) -> List[str]:
         """Validate and clean process list."""
-        return [p.strip().lower() for p in v if p.strip()]
+        return [p for p in map(_normalize_name, v) if p]
     
     @field_validator('websites')
     @classmethod
@@ -109,14 +127,18 @@ class ActivityRequest(BaseModel):
         """Validate and clean website list."""
         if v is None:
             return []
-        return [w.strip().lower() for w in v if w.strip()]
+        return [w for w in map(_normalize_name, v) if w]
     
     @field_validator('destinations')
     @classmethod
     def validate_destinations(cls, v: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
-        """Validate destinations list."""
+        """Validate destinations list and lowercase each domain once on ingress."""
         if v is None:
             return []
+        for dest in v:
+            domain = dest.get('domain')
+            if isinstance(domain, str):
+                dest['domain'] = domain.strip().lower()
         return v
 
 
@@ -129,6 +151,15 @@ class ActivityResponse(BaseModel):
     alert_id: Optional[int] = Field(None, description="ID of created alert if violation occurred")
 
 
+class ActivityBatchResponse(BaseModel):
+    """Response model for batched activity submission."""
+    success: bool = Field(..., description="Whether the batch was recorded")
+    inserted: int = Field(..., description="Number of activity records created")
+    activity_ids: List[int] = Field(..., description="IDs of the created activity records, in submission order")
+    alert_ids: List[int] = Field(default_factory=list, description="IDs of alerts created for violations in the batch")
+    message: str = Field(..., description="Response message")
+
+
 # ============================================================================
 # ALERT MODELS
 # ============================================================================
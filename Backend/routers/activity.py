@@ -2,18 +2,137 @@
 Activity router - Handles student activity data submission.
 Receives data from Python agents on student machines.
 """
-from fastapi import APIRouter, HTTPException, status
-from typing import Dict, Any
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from typing import Dict, Any, List, Optional, Tuple
 import logging
+import orjson
+import re
 
-from models import ActivityRequest, ActivityResponse
+from config import settings
+from models import ActivityRequest, ActivityResponse, ActivityBatchResponse, ViolationResult
 from database import db
 from alerts import detector
+from utils.command_notifier import command_notifier
+from utils.response_cache import response_cache, ADMIN_LOGS_KEY
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Map blocked keywords to known malicious domains for auto-blocking
+AUTO_BLOCK_DOMAINS = {
+    'torrent': ('thepiratebay.org', 'kickasstorrents.to', '1337x.to', 'torrentgalaxy.to'),
+    'proxy': ('proxysite.com', 'hidester.com', 'croxyproxy.com', 'kproxy.com'),
+    'nmap': ('insecure.org', 'nmap.org'),
+    'wireshark': ('wireshark.org',),
+    'metasploit': ('metasploit.com', 'rapid7.com')
+}
+# One precompiled alternation scans a process name for every keyword at once
+_AUTO_BLOCK_PATTERN = re.compile("|".join(re.escape(keyword) for keyword in AUTO_BLOCK_DOMAINS))
+
+# Most activity samples accepted in one /activity/batch request
+MAX_BATCH_SIZE = 1000
+
+
+def _all_websites(activity: ActivityRequest) -> List[str]:
+    """
+    Merge destination domains (or IPs) with the legacy websites field.
+    
+    Args:
+        activity: Validated activity sample
+    
+    Returns:
+        List of unique websites/addresses, destinations first
+    """
+    # One pass into an insertion-ordered dict dedupes without building a set
+    seen = {}
+    for destination in activity.destinations or ():
+        target = destination.get('domain') or destination.get('ip')
+        if target:
+            seen[target] = None
+    for website in activity.websites or ():
+        seen[website] = None
+    return list(seen)
+
+
+def _check_and_alert(
+    activity: ActivityRequest,
+    activity_id: int,
+    violation_result: Optional[ViolationResult] = None
+) -> Tuple[ViolationResult, Optional[int]]:
+    """
+    Check a stored activity against policy, raising an alert and auto-block
+    commands for violations.
+    
+    Args:
+        activity: Validated activity sample
+        activity_id: ID of the stored activity record
+        violation_result: Result already computed for the sample (batch
+            ingest checks all samples at once); checked here if None
+    
+    Returns:
+        (violation_result, alert_id) where alert_id is None if no alert was created
+    """
+    # Check for policy violations
+    if violation_result is None:
+        violation_result = detector.check_violations(
+            processes=activity.processes,
+            bytes_sent=activity.bytes_sent,
+            bytes_recv=activity.bytes_recv,
+            hostname=activity.hostname,
+            destinations=activity.destinations,
+            cpu_percent=activity.cpu_percent,
+            memory_percent=activity.memory_percent,
+            disk_percent=activity.disk_percent,
+            active_connections=activity.active_connections,
+            upload_rate_kbps=activity.upload_rate_kbps,
+            download_rate_kbps=activity.download_rate_kbps
+        )
+    
+    alert_id = None
+    
+    # Create alert if violation detected
+    if violation_result.violation:
+        logger.warning(
+            f"Policy violation detected for {activity.hostname}: "
+            f"{violation_result.reason}"
+        )
+        
+        alert_id = db.insert_alert(
+            hostname=activity.hostname,
+            reason=violation_result.reason,
+            severity=violation_result.severity,
+            activity_id=activity_id
+        )
+        
+        # Auto-block known malicious domains based on detected processes
+        if violation_result.violated_processes:
+            domains_to_block = set()
+            for process in violation_result.violated_processes:
+                # Process names arrive lowercased from ActivityRequest
+                found = _AUTO_BLOCK_PATTERN.search(process)
+                if found is not None:
+                    domains_to_block.update(AUTO_BLOCK_DOMAINS[found.group(0)])
+            
+            # Create block commands for detected domains
+            for domain in domains_to_block:
+                try:
+                    db.add_command(
+                        student_id=activity.hostname,
+                        action="BLOCK_DOMAIN", 
+                        domain=domain,
+                        reason=f"Auto-block: {', '.join(violation_result.violated_processes)} process detected"
+                    )
+                    logger.info(f"Auto-blocking {domain} for {activity.hostname} due to policy violation")
+                except Exception as e:
+                    logger.error(f"Failed to create auto-block command for {domain}: {e}")
+            
+            if domains_to_block:
+                command_notifier.notify(activity.hostname)  # Wake the agent's long-poll
+    
+    return violation_result, alert_id
+
 # Create router
 router = APIRouter(
     prefix="/activity",
@@ -24,6 +143,16 @@ router = APIRouter(
     }
 )
 
+# ActivityResponse body for the common no-violation case; only the
+# activity_id differs between requests
+_OK_RESPONSE_TEMPLATE = {
+    "success": True,
+    "activity_id": None,
+    "message": "Activity recorded successfully",
+    "violation_detected": False,
+    "alert_id": None
+}
+
 
 @router.post(
     "",
@@ -57,26 +186,21 @@ async def submit_activity(activity: ActivityRequest) -> ActivityResponse:
         HTTPException: If database operation fails
     """
     try:
-        # Extract domains from destinations
-        domains = []
-        if activity.destinations:
-            domains = [d.get('domain') or d.get('ip') for d in activity.destinations if d.get('domain') or d.get('ip')]
-        
-        # Combine with legacy websites field
-        all_websites = list(set(domains + (activity.websites or [])))
+        all_websites = _all_websites(activity)
         
-        # 📥 Print for monitoring
-        print("📥 Activity received:", {
-            "hostname": activity.hostname,
-            "bytes_sent": activity.bytes_sent,
-            "bytes_recv": activity.bytes_recv,
-            "processes": activity.processes[:3] if len(activity.processes) > 3 else activity.processes,
-            "destinations": activity.destinations[:3] if len(activity.destinations) > 3 else activity.destinations,
-            "websites": all_websites[:3] if len(all_websites) > 3 else all_websites,
-            "total_processes": len(activity.processes),
-            "total_destinations": len(activity.destinations),
-            "agent_time": activity.timestamp
-        })
+        # 📥 Print for monitoring (development only; stdout is synchronous)
+        if settings.DEBUG:
+            print("📥 Activity received:", {
+                "hostname": activity.hostname,
+                "bytes_sent": activity.bytes_sent,
+                "bytes_recv": activity.bytes_recv,
+                "processes": activity.processes[:3],
+                "destinations": activity.destinations[:3],
+                "websites": all_websites[:3],
+                "total_processes": len(activity.processes),
+                "total_destinations": len(activity.destinations),
+                "agent_time": activity.timestamp
+            })
         
         # Log incoming activity
         logger.info(
@@ -85,103 +209,187 @@ async def submit_activity(activity: ActivityRequest) -> ActivityResponse:
             f"{len(activity.processes)} processes, {len(activity.destinations)} destinations"
         )
         
-        # Store activity in database
-        activity_id = db.insert_activity(
-            hostname=activity.hostname,
-            bytes_sent=activity.bytes_sent,
-            bytes_recv=activity.bytes_recv,
-            processes=activity.processes,
-            websites=all_websites,
-            destinations=activity.destinations,
-            agent_timestamp=activity.timestamp,
-            open_tabs=activity.open_tabs or [],
-            cpu_percent=activity.cpu_percent,
-            memory_percent=activity.memory_percent,
-            disk_percent=activity.disk_percent,
-            active_connections=activity.active_connections,
-            upload_rate_kbps=activity.upload_rate_kbps,
-            download_rate_kbps=activity.download_rate_kbps
+        # Store and check in the threadpool: the event loop stays free to accept
+        # other agents' posts, whose inserts the database writer thread then
+        # commits together in one transaction
+        activity_id, violation_result, alert_id = await run_in_threadpool(
+            _store_activity, activity, all_websites
         )
         
-        # Check for policy violations
-        violation_result = detector.check_violations(
-            processes=activity.processes,
-            bytes_sent=activity.bytes_sent,
-            bytes_recv=activity.bytes_recv,
-            hostname=activity.hostname,
-            destinations=activity.destinations,
-            cpu_percent=activity.cpu_percent,
-            memory_percent=activity.memory_percent,
-            disk_percent=activity.disk_percent,
-            active_connections=activity.active_connections,
-            upload_rate_kbps=activity.upload_rate_kbps,
-            download_rate_kbps=activity.download_rate_kbps
+        # Build response; every agent heartbeat lands here, so send the
+        # ActivityResponse fields directly instead of validating a model
+        if not violation_result.violation:
+            content = {**_OK_RESPONSE_TEMPLATE, "activity_id": activity_id}
+        else:
+            content = {
+                "success": True,
+                "activity_id": activity_id,
+                "message": "Activity recorded successfully",
+                "violation_detected": True,
+                "alert_id": alert_id
+            }
+        return ORJSONResponse(status_code=status.HTTP_201_CREATED, content=content)
+    
+    except Exception as e:
+        logger.error(f"Error processing activity: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process activity: {str(e)}"
         )
-        
-        alert_id = None
-        
-        # Create alert if violation detected
-        if violation_result.violation:
-            logger.warning(
-                f"Policy violation detected for {activity.hostname}: "
-                f"{violation_result.reason}"
+
+
+def _store_activity(
+    activity: ActivityRequest,
+    all_websites: List[str]
+) -> Tuple[int, ViolationResult, Optional[int]]:
+    """
+    Store one activity sample and run its policy check.
+    
+    Args:
+        activity: Validated activity sample
+        all_websites: Merged websites for the sample (see _all_websites)
+    
+    Returns:
+        (activity_id, violation_result, alert_id) where alert_id is None if no
+        alert was created
+    """
+    activity_id = db.insert_activity(
+        hostname=activity.hostname,
+        bytes_sent=activity.bytes_sent,
+        bytes_recv=activity.bytes_recv,
+        processes=activity.processes,
+        websites=all_websites,
+        destinations=activity.destinations,
+        agent_timestamp=activity.timestamp,
+        open_tabs=activity.open_tabs or [],
+        cpu_percent=activity.cpu_percent,
+        memory_percent=activity.memory_percent,
+        disk_percent=activity.disk_percent,
+        active_connections=activity.active_connections,
+        upload_rate_kbps=activity.upload_rate_kbps,
+        download_rate_kbps=activity.download_rate_kbps
+    )
+    response_cache.invalidate(ADMIN_LOGS_KEY)  # New row for /admin/logs
+    
+    violation_result, alert_id = _check_and_alert(activity, activity_id)
+    return activity_id, violation_result, alert_id
+
+
+def _store_activity_batch(activities: List[ActivityRequest]) -> ActivityBatchResponse:
+    """
+    Store a batch of activity samples in one transaction, then run policy
+    checks for each of them.
+    
+    Args:
+        activities: Validated activity samples
+    
+    Returns:
+        ActivityBatchResponse: IDs of the stored activities and created alerts
+    """
+    activity_ids = db.insert_activities_many([
+        {
+            'hostname': activity.hostname,
+            'bytes_sent': activity.bytes_sent,
+            'bytes_recv': activity.bytes_recv,
+            'processes': activity.processes,
+            'websites': _all_websites(activity),
+            'destinations': activity.destinations,
+            'agent_timestamp': activity.timestamp,
+            'open_tabs': activity.open_tabs or [],
+            'cpu_percent': activity.cpu_percent,
+            'memory_percent': activity.memory_percent,
+            'disk_percent': activity.disk_percent,
+            'active_connections': activity.active_connections,
+            'upload_rate_kbps': activity.upload_rate_kbps,
+            'download_rate_kbps': activity.download_rate_kbps
+        }
+        for activity in activities
+    ])
+    response_cache.invalidate(ADMIN_LOGS_KEY)  # New rows for /admin/logs
+    
+    # Thresholds for the whole batch are compared in one vectorised pass
+    violation_results = detector.check_violations_many(activities)
+    
+    alert_ids = []
+    for activity, activity_id, violation_result in zip(activities, activity_ids, violation_results):
+        _, alert_id = _check_and_alert(activity, activity_id, violation_result)
+        if alert_id is not None:
+            alert_ids.append(alert_id)
+    
+    return ActivityBatchResponse(
+        success=True,
+        inserted=len(activity_ids),
+        activity_ids=activity_ids,
+        alert_ids=alert_ids,
+        message=f"{len(activity_ids)} activities recorded successfully"
+    )
+
+
+@router.post(
+    "/batch",
+    response_model=ActivityBatchResponse,
+    status_code=status.HTTP_201_CREATED,
+    summary="Submit a batch of student activity samples",
+    description="""
+    Receives many activity samples in one request as newline-delimited JSON
+    (application/x-ndjson), one ActivityRequest object per line.
+    
+    The whole batch is stored in a single database transaction, then each
+    sample is checked for policy violations exactly as on POST /activity.
+    Blank lines are ignored; at most 1000 samples are accepted per request.
+    """
+)
+async def submit_activity_batch(request: Request) -> ActivityBatchResponse:
+    """
+    Process and store a batch of student activity samples.
+    
+    Args:
+        request: Request whose body holds one JSON activity object per line
+    
+    Returns:
+        ActivityBatchResponse: Confirmation with activity and alert IDs
+    
+    Raises:
+        HTTPException: If a line is invalid, the batch is empty or too large,
+            or the database operation fails
+    """
+    body = await request.body()
+    
+    activities = []
+    for line_number, line in enumerate(body.splitlines(), start=1):
+        if not line.strip():
+            continue
+        # Reject an oversized batch before parsing the rest of it
+        if len(activities) == MAX_BATCH_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Batch exceeds {MAX_BATCH_SIZE} activities"
             )
-            
-            alert_id = db.insert_alert(
-                hostname=activity.hostname,
-                reason=violation_result.reason,
-                severity=violation_result.severity,
-                activity_id=activity_id
+        try:
+            # JSON and validation errors are both ValueErrors
+            activities.append(ActivityRequest.model_validate(orjson.loads(line)))
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Invalid activity on line {line_number}: {str(e)}"
             )
-            
-            # Auto-block known malicious domains based on detected processes
-            if violation_result.violated_processes:
-                # Map blocked keywords to known malicious domains
-                block_domains = {
-                    'torrent': ['thepiratebay.org', 'kickasstorrents.to', '1337x.to', 'torrentgalaxy.to'],
-                    'proxy': ['proxysite.com', 'hidester.com', 'croxyproxy.com', 'kproxy.com'],
-                    'nmap': ['insecure.org', 'nmap.org'],
-                    'wireshark': ['wireshark.org'],
-                    'metasploit': ['metasploit.com', 'rapid7.com']
-                }
-                
-                domains_to_block = set()
-                for process in violation_result.violated_processes:
-                    process_lower = process.lower()
-                    for keyword, domains in block_domains.items():
-                        if keyword in process_lower:
-                            domains_to_block.update(domains)
-                            break
-                
-                # Create block commands for detected domains
-                for domain in domains_to_block:
-                    try:
-                        command_id = db.add_command(
-                            student_id=activity.hostname,
-                            action="BLOCK_DOMAIN", 
-                            domain=domain,
-                            reason=f"Auto-block: {', '.join(violation_result.violated_processes)} process detected"
-                        )
-                        logger.info(f"Auto-blocking {domain} for {activity.hostname} due to policy violation")
-                    except Exception as e:
-                        logger.error(f"Failed to create auto-block command for {domain}: {e}")
-        
-        
-        
-        # Build response
-        return ActivityResponse(
-            success=True,
-            activity_id=activity_id,
-            message="Activity recorded successfully",
-            violation_detected=violation_result.violation,
-            alert_id=alert_id
+    
+    if not activities:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Batch contains no activities"
         )
     
+    logger.info(f"Received activity batch: {len(activities)} samples")
+    
+    try:
+        # Off the event loop; the insert waits on the database writer thread
+        return await run_in_threadpool(_store_activity_batch, activities)
     except Exception as e:
-        logger.error(f"Error processing activity: {str(e)}")
+        logger.error(f"Error processing activity batch: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"Failed to process activity: {str(e)}"
+            detail=f"Failed to process activity batch: {str(e)}"
         )
 
 
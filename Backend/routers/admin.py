@@ -0,0 +1,305 @@
+"""
+Admin router - Dashboard data feeds and remote commands for student machines.
+Serves activity logs to the admin dashboard and queues block/unblock commands.
+"""
+from fastapi import APIRouter, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response
+from pydantic import BaseModel, Field
+from typing import Optional
+from datetime import datetime
+import logging
+import orjson
+
+from database import db
+from models import ActivityRequest
+from routers.activity import submit_activity
+from utils.command_notifier import command_notifier
+from utils.response_cache import response_cache, ADMIN_LOGS_KEY
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Largest page GET /admin/activities will return
+MAX_ACTIVITY_RECORDS = 1000
+
+# Create router
+router = APIRouter(
+    prefix="/admin",
+    tags=["Admin"],
+    responses={
+        404: {"description": "Not found"},
+        422: {"description": "Validation error"}
+    }
+)
+
+
+class DomainCommandRequest(BaseModel):
+    """Request model for remote block/unblock commands."""
+    student_id: str = Field(..., min_length=1, description="Student hostname/ID", examples=["STUDENT-PC-001"])
+    domain: str = Field(..., min_length=1, description="Domain to block or unblock", examples=["youtube.com"])
+    reason: Optional[str] = Field(default=None, description="Reason for the command")
+
+
+def _cached_json_response(request: Request, body: bytes, etag: str) -> Response:
+    """
+    Build a response for a cached JSON body, honouring If-None-Match.
+    
+    Args:
+        request: Incoming request
+        body: Serialized JSON body
+        etag: Quoted ETag of the body
+    
+    Returns:
+        Response: 304 if the client already has this body, else the JSON body
+    """
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# 📡 Admin endpoint for fetching student activity logs
+@router.get(
+    "/logs",
+    summary="Get student activity logs",
+    description="Retrieve recent student activity data for admin dashboard monitoring"
+)
+async def get_student_logs(request: Request):
+    """
+    Get recent student activity logs for admin dashboard.
+    
+    The formatted payload is cached for a few seconds (and dropped on new
+    activity), and carries an ETag so unchanged polls get 304 Not Modified.
+    
+    Returns:
+        List of recent activity records with formatted data
+    """
+    cached = response_cache.get(ADMIN_LOGS_KEY)
+    if cached is not None:
+        return _cached_json_response(request, *cached)
+    
+    try:
+        # SQLite shapes and serializes the rows; run off the event loop so
+        # concurrent pollers don't queue behind it
+        body = await run_in_threadpool(db.get_admin_logs_json_bytes, limit=50)
+        body, etag = response_cache.set_body(ADMIN_LOGS_KEY, body)
+        return _cached_json_response(request, body, etag)
+        
+    except Exception as e:
+        logger.error(f"Error fetching admin logs: {str(e)}")
+        # Include the actual error in response for debugging
+        return [
+            {
+                "error": f"Database error: {str(e)}",
+                "hostname": "ERROR", 
+                "cpu": 0,
+                "memory": 0, 
+                "disk": 0,
+                "network": 0,
+                "network_mb": 0,
+                "bytes_sent": 0,
+                "bytes_recv": 0,
+                "apps": [],
+                "processes": [],
+                "websites": [],
+                "destinations": [],
+                "timestamp": datetime.now().isoformat(),
+                "raw_timestamp": datetime.now().isoformat(),
+                "activity_id": 0
+            }
+        ]
+
+
+# 📡 Admin endpoint for raw activity records
+@router.get(
+    "/activities",
+    summary="Get raw activity records",
+    description="Retrieve recent activity records exactly as stored, serialized by SQLite"
+)
+def get_recent_activity_records(
+    limit: int = Query(50, ge=1, le=MAX_ACTIVITY_RECORDS, description="Maximum records to return")
+):
+    """
+    Get recent raw activity records.
+    
+    Args:
+        limit: Maximum number of records to return
+    
+    Returns:
+        Response: JSON array of activity records, newest first
+    """
+    try:
+        # limit is capped, so the whole body is built while the read
+        # connection is checked out and nothing is held across the send
+        body = db.get_recent_activities_json_bytes(limit=limit)
+    except Exception as e:
+        logger.error(f"Error fetching activity records: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to retrieve activity records"
+        )
+    
+    return Response(content=body, media_type="application/json")
+
+
+@router.post(
+    "/block-domain",
+    summary="Block domain on student machine",
+    description="Admin endpoint to remotely block a website on a specific student laptop"
+)
+def block_domain_on_student(request: DomainCommandRequest):
+    """
+    Issue a block command for a student machine.
+    The student agent will poll and execute this command locally.
+    
+    Request body:
+    {
+        "student_id": "STUDENT-PC-001",
+        "domain": "youtube.com",
+        "reason": "Unauthorized access"
+    }
+    
+    Returns:
+        Success confirmation
+    """
+    try:
+        # Missing or empty student_id/domain are rejected by the model (422)
+        student_id = request.student_id
+        domain = request.domain
+        reason = request.reason or 'Admin policy violation'
+        
+        # Add command to queue
+        command_id = db.add_command(
+            student_id=student_id,
+            action="BLOCK_DOMAIN",
+            domain=domain,
+            reason=reason
+        )
+        command_notifier.notify(student_id)  # Wake the agent's long-poll
+        
+        logger.info(f"Admin issued BLOCK command: {domain} for student {student_id}")
+        
+        return {
+            "success": True,
+            "message": f"Block command issued for {domain} on {student_id}",
+            "command_id": command_id,
+            "student_id": student_id,
+            "domain": domain
+        }
+        
+    except Exception as e:
+        logger.error(f"Error issuing block command: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to issue block command: {str(e)}"
+        )
+
+
+@router.post(
+    "/unblock-domain",
+    summary="Unblock domain on student machine",
+    description="Admin endpoint to remotely unblock a website on a specific student laptop"
+)
+def unblock_domain_on_student(request: DomainCommandRequest):
+    """
+    Issue an unblock command for a student machine.
+    The student agent will poll and execute this command locally.
+    
+    Request body:
+    {
+        "student_id": "STUDENT-PC-001",
+        "domain": "youtube.com",
+        "reason": "Access restored"
+    }
+    
+    Returns:
+        Success confirmation
+    """
+    try:
+        # Missing or empty student_id/domain are rejected by the model (422)
+        student_id = request.student_id
+        domain = request.domain
+        reason = request.reason or 'Admin unblock request'
+        
+        # Add command to queue
+        command_id = db.add_command(
+            student_id=student_id,
+            action="UNBLOCK_DOMAIN",
+            domain=domain,
+            reason=reason
+        )
+        command_notifier.notify(student_id)  # Wake the agent's long-poll
+        
+        logger.info(f"Admin issued UNBLOCK command: {domain} for student {student_id}")
+        
+        return {
+            "success": True,
+            "message": f"Unblock command issued for {domain} on {student_id}",
+            "command_id": command_id,
+            "student_id": student_id,
+            "domain": domain
+        }
+        
+    except Exception as e:
+        logger.error(f"Error issuing unblock command: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to issue unblock command: {str(e)}"
+        )
+
+
+@router.post(
+    "/test-blocked-processes",
+    summary="Test student with blocked processes",
+    description="Simulate a student with blocked processes to test auto-blocking functionality"
+)
+async def test_blocked_processes():
+    """
+    Create a test activity submission with blocked processes to test auto-blocking.
+    
+    This will trigger the policy violation detection and auto-blocking functionality.
+    
+    Returns:
+        Success confirmation
+    """
+    try:
+        # Create test activity with blocked processes
+        test_activity = ActivityRequest(
+            hostname="TEST-STUDENT-PC",
+            timestamp=datetime.now().isoformat(),
+            bytes_sent=1024000,
+            bytes_recv=2048000,
+            cpu_percent=45.2,
+            memory_percent=65.3,
+            disk_percent=55.1,
+            active_connections=25,
+            upload_rate_kbps=150.5,
+            download_rate_kbps=800.2,
+            processes=["chrome.exe", "torrent.exe", "proxy-tool.exe", "nmap.exe", "notepad.exe"],  # Contains blocked keywords
+            websites=["google.com", "thepiratebay.org", "facebook.com"],
+            destinations=[
+                {"ip": "142.250.191.14", "port": 443, "domain": "google.com"},
+                {"ip": "185.8.156.2", "port": 443, "domain": "thepiratebay.org"},
+                {"ip": "157.240.22.35", "port": 443, "domain": "facebook.com"}
+            ]
+        )
+        
+        # Submit the test activity (the response body is the serialized ActivityResponse)
+        result = orjson.loads((await submit_activity(test_activity)).body)
+        
+        return {
+            "success": True,
+            "message": "Test activity with blocked processes submitted",
+            "activity_id": result["activity_id"],
+            "violation_detected": result["violation_detected"],
+            "alert_id": result["alert_id"],
+            "test_processes": test_activity.processes
+        }
+        
+    except Exception as e:
+        logger.error(f"Error creating test activity: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create test activity: {str(e)}"
+        )
@@ -3,15 +3,15 @@ Alerts router - Handles alert management and retrieval.
 Provides endpoints for viewing and resolving security alerts.
 """
 from fastapi import APIRouter, HTTPException, status, Path
-from typing import Dict, Any
+from fastapi.responses import ORJSONResponse
+from typing import Dict, Any, List
 import logging
 from datetime import datetime
 
-from models import AlertResponse, AlertListResponse, AlertResolveResponse
+from models import AlertListResponse, AlertResolveResponse
 from database import db
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create router
@@ -24,6 +24,22 @@ router = APIRouter(
 )
 
 
+def _alert_list_response(alerts: List[Dict[str, Any]]) -> ORJSONResponse:
+    """
+    Build an AlertListResponse body from alert rows.
+    
+    Rows already carry exactly the AlertResponse fields; returning a
+    Response skips building and re-validating one model per alert.
+    
+    Args:
+        alerts: Alert dictionaries from the database
+    
+    Returns:
+        ORJSONResponse: Alerts with their count
+    """
+    return ORJSONResponse({"alerts": alerts, "total": len(alerts)})
+
+
 @router.get(
     "",
     response_model=AlertListResponse,
@@ -35,7 +51,7 @@ router = APIRouter(
     Useful for historical analysis and audit trails.
     """
 )
-async def get_all_alerts() -> AlertListResponse:
+def get_all_alerts() -> AlertListResponse:
     """
     Retrieve all alerts.
     
@@ -46,28 +62,11 @@ async def get_all_alerts() -> AlertListResponse:
         HTTPException: If database operation fails
     """
     try:
-        alerts_data = db.get_all_alerts()
-        
-        alerts = [
-            AlertResponse(
-                id=alert['id'],
-                hostname=alert['hostname'],
-                reason=alert['reason'],
-                severity=alert['severity'],
-                status=alert['status'],
-                timestamp=alert['timestamp'],
-                resolved_at=alert['resolved_at'],
-                activity_id=alert['activity_id']
-            )
-            for alert in alerts_data
-        ]
+        alerts = db.get_all_alerts()
         
         logger.info(f"Retrieved {len(alerts)} total alerts")
         
-        return AlertListResponse(
-            alerts=alerts,
-            total=len(alerts)
-        )
+        return _alert_list_response(alerts)
     
     except Exception as e:
         logger.error(f"Error retrieving alerts: {str(e)}")
@@ -88,7 +87,7 @@ async def get_all_alerts() -> AlertListResponse:
     where administrators need to see pending security issues.
     """
 )
-async def get_active_alerts() -> AlertListResponse:
+def get_active_alerts() -> AlertListResponse:
     """
     Retrieve active (unresolved) alerts.
     
@@ -99,28 +98,11 @@ async def get_active_alerts() -> AlertListResponse:
         HTTPException: If database operation fails
     """
     try:
-        alerts_data = db.get_active_alerts()
-        
-        alerts = [
-            AlertResponse(
-                id=alert['id'],
-                hostname=alert['hostname'],
-                reason=alert['reason'],
-                severity=alert['severity'],
-                status=alert['status'],
-                timestamp=alert['timestamp'],
-                resolved_at=alert['resolved_at'],
-                activity_id=alert['activity_id']
-            )
-            for alert in alerts_data
-        ]
+        alerts = db.get_active_alerts()
         
         logger.info(f"Retrieved {len(alerts)} active alerts")
         
-        return AlertListResponse(
-            alerts=alerts,
-            total=len(alerts)
-        )
+        return _alert_list_response(alerts)
     
     except Exception as e:
         logger.error(f"Error retrieving active alerts: {str(e)}")
@@ -145,7 +127,7 @@ async def get_active_alerts() -> AlertListResponse:
     The alert will be timestamped with the resolution time.
     """
 )
-async def resolve_alert(
+def resolve_alert(
     alert_id: int = Path(..., description="ID of the alert to resolve", ge=1)
 ) -> AlertResolveResponse:
     """
@@ -212,7 +194,7 @@ async def test_alerts_router() -> Dict[str, Any]:
     summary="Generate test alerts for college prototype",
     description="Generate sample alerts for testing purposes in college environment"
 )
-async def generate_test_alerts() -> Dict[str, Any]:
+def generate_test_alerts() -> Dict[str, Any]:
     """
     Generate test alerts for college prototype demonstration.
     
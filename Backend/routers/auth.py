@@ -3,10 +3,13 @@ Authentication router - Handles admin login and JWT token management.
 Integrates Member 1's authentication system with proper API structure.
 """
 from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional
 import logging
 
+from auth import authenticate
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
@@ -20,9 +23,8 @@ router = APIRouter(
     }
 )
 
-# For demo purposes - in production, use proper JWT tokens and hashed passwords
-ADMIN_USERNAME = "admin"
-ADMIN_PASSWORD = "admin123"
+# For demo purposes - in production, use proper JWT tokens and salted password hashes
+# (auth.authenticate compares SHA-256 digests in constant time)
 
 
 class LoginRequest(BaseModel):
@@ -39,20 +41,6 @@ class LoginResponse(BaseModel):
     message: str = Field(..., description="Success message")
 
 
-def authenticate(username: str, password: str) -> bool:
-    """
-    Authenticate admin credentials.
-    
-    Args:
-        username: Admin username
-        password: Admin password
-        
-    Returns:
-        bool: True if authentication successful
-    """
-    return username == ADMIN_USERNAME and password == ADMIN_PASSWORD
-
-
 @router.post(
     "/login",
     response_model=LoginResponse,
@@ -90,12 +78,12 @@ async def login(request: LoginRequest) -> LoginResponse:
             token = f"admin-token-{request.username}-demo"
             
             logger.info(f"Successful login for username: {request.username}")
-            return LoginResponse(
-                success=True,
-                token=token,
-                username=request.username,
-                message="Login successful"
-            )
+            return ORJSONResponse({
+                "success": True,
+                "token": token,
+                "username": request.username,
+                "message": "Login successful"
+            })
         else:
             logger.warning(f"Failed login attempt for username: {request.username}")
             raise HTTPException(
@@ -3,10 +3,14 @@ Commands router - Handles command polling from student agents.
 Students poll this endpoint to check for remote commands from admin.
 """
 from fastapi import APIRouter, HTTPException, status, Query
-from typing import List, Dict, Any
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
+from typing import List, Dict, Any, Optional
+import asyncio
 import logging
 
 from database import db
+from utils.command_notifier import command_notifier
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -21,6 +25,12 @@ router = APIRouter(
     }
 )
 
+# Longest a GET /commands long-poll may hold the request open
+MAX_WAIT_SECONDS = 30
+
+# Largest page GET /commands/all will return
+MAX_COMMANDS_PAGE = 500
+
 
 @router.get(
     "",
@@ -35,45 +45,58 @@ router = APIRouter(
     
     This is part of the remote management system where admin dashboard
     can control student machines via backend.
+    
+    Pass `wait` (seconds, up to 30) to long-poll: when nothing is pending the
+    request is held until a command is queued for the student or the wait
+    runs out, instead of the agent re-polling on a short interval.
     """
 )
 async def get_commands(
-    student_id: str = Query(..., description="Student hostname/ID")
+    student_id: str = Query(..., description="Student hostname/ID"),
+    wait: float = Query(0, ge=0, le=MAX_WAIT_SECONDS, description="Seconds to wait for a command when none are pending")
 ) -> Dict[str, Any]:
     """
     Get pending commands for a student agent.
     
     Args:
         student_id: Student machine hostname
+        wait: Seconds to hold the request open when no commands are pending
     
     Returns:
         Dictionary with list of pending commands
     """
     try:
-        # Get pending commands from database
-        commands = db.get_pending_commands(student_id)
+        # Listen before claiming, so a command queued in between still wakes us
+        wake = command_notifier.listen(student_id) if wait else None
+        
+        # Fetch pending commands and mark them executed (delivered to agent)
+        # in a single statement
+        commands = await run_in_threadpool(db.claim_pending_commands, student_id)
         
-        # Mark commands as executed (delivered to agent)
-        for cmd in commands:
-            db.mark_command_executed(cmd['id'])
+        if not commands and wake is not None:
+            try:
+                await asyncio.wait_for(wake.wait(), timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            else:
+                commands = await run_in_threadpool(db.claim_pending_commands, student_id)
         
         if commands:
             logger.info(f"Delivered {len(commands)} command(s) to student {student_id}")
         
         # Format commands for agent
-        formatted_commands = []
-        for cmd in commands:
-            formatted_commands.append({
-                "action": cmd['action'],
-                "domain": cmd['domain'],
-                "reason": cmd['reason']
-            })
+        formatted_commands = [
+            {"action": cmd['action'], "domain": cmd['domain'], "reason": cmd['reason']}
+            for cmd in commands
+        ]
         
-        return {
+        # Every agent polls this endpoint; return the response directly so
+        # the dict isn't walked by jsonable_encoder before serialization
+        return ORJSONResponse({
             "student_id": student_id,
             "commands": formatted_commands,
             "count": len(formatted_commands)
-        }
+        })
         
     except Exception as e:
         logger.error(f"Error retrieving commands for {student_id}: {str(e)}")
@@ -88,10 +111,10 @@ async def get_commands(
     summary="Get currently blocked domains for a student",
     description="Returns a list of domains currently blocked for the given student."
 )
-async def get_blocked_domains(student_id: str = Query(..., description="Student hostname/ID")) -> Dict[str, Any]:
+def get_blocked_domains(student_id: str = Query(..., description="Student hostname/ID")) -> Dict[str, Any]:
     try:
         blocked_domains = db.get_currently_blocked_domains(student_id)
-        return {"student_id": student_id, "blocked_domains": blocked_domains, "count": len(blocked_domains)}
+        return ORJSONResponse({"student_id": student_id, "blocked_domains": blocked_domains, "count": len(blocked_domains)})
     except Exception as e:
         logger.error(f"Error retrieving blocked domains for {student_id}: {str(e)}")
         raise HTTPException(
@@ -102,27 +125,36 @@ async def get_blocked_domains(student_id: str = Query(..., description="Student
 @router.get(
     "/all",
     summary="Get all commands (admin)",
-    description="Admin endpoint to view all commands in the system"
+    description="""
+    Admin endpoint to view all commands in the system, newest first.
+    
+    Results are paged by command id: pass the returned `next_cursor` as
+    `before` to fetch the next (older) page. `next_cursor` is null once
+    there are no more commands.
+    """
 )
-async def get_all_commands(
-    limit: int = Query(100, description="Maximum commands to return")
+def get_all_commands(
+    limit: int = Query(100, ge=1, le=MAX_COMMANDS_PAGE, description="Maximum commands to return"),
+    before: Optional[int] = Query(None, ge=1, description="Return commands with an id below this cursor")
 ) -> Dict[str, Any]:
     """
     Get all commands for admin dashboard.
     
     Args:
         limit: Maximum number of commands to return
+        before: Cursor from a previous page's next_cursor
     
     Returns:
-        Dictionary with all commands
+        Dictionary with a page of commands and the cursor for the next one
     """
     try:
-        commands = db.get_all_commands(limit=limit)
+        commands = db.get_all_commands(limit=limit, before=before)
         
-        return {
+        return ORJSONResponse({
             "commands": commands,
-            "count": len(commands)
-        }
+            "count": len(commands),
+            "next_cursor": commands[-1]['id'] if len(commands) == limit else None
+        })
         
     except Exception as e:
         logger.error(f"Error retrieving all commands: {str(e)}")
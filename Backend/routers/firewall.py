@@ -3,15 +3,25 @@ Firewall router - Handles IP blocking and firewall management.
 Integrates with Windows Firewall for network security enforcement.
 """
 from fastapi import APIRouter, HTTPException, status
-from pydantic import BaseModel, Field
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, Field, field_validator
+from typing import List
+import ipaddress
 import subprocess
 import logging
 import platform
 import socket
 
+from database import db
+from firewall import add_block_rules, block_rule_name, delete_rules, list_block_rules
+from utils.dns_cache import dns_cache
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Most IPs accepted by one /firewall/block-bulk request
+MAX_BULK_BLOCK_IPS = 500
+
 # Create router
 router = APIRouter(
     prefix="/firewall",
@@ -24,10 +34,82 @@ router = APIRouter(
 )
 
 
+def _record_rules(rules: List[tuple]):
+    """
+    Record newly created rules so /unblock can find them by target.
+    
+    The rules already exist in the firewall, so a failure here is logged
+    rather than turned into an error response.
+    
+    Args:
+        rules: (rule_name, target, ip, reason) tuples
+    """
+    try:
+        db.record_firewall_rules(rules)
+    except Exception as e:
+        logger.error(f"Failed to record firewall rules: {str(e)}")
+
+
+def _is_permission_error(result: subprocess.CompletedProcess) -> bool:
+    """
+    Check whether a failed firewall call was refused for lack of elevation.
+    
+    Args:
+        result: Completed firewall call
+    
+    Returns:
+        bool: True if the backend needs to run as Administrator
+    """
+    error_msg = (result.stderr + result.stdout).lower()
+    return "access is denied" in error_msg or "requested operation requires elevation" in error_msg
+
+
+def _validate_ip(value: str) -> str:
+    """
+    Ensure a value is a single IP address or CIDR network.
+    
+    Args:
+        value: Address from the request
+    
+    Returns:
+        str: The address with surrounding whitespace trimmed
+    
+    Raises:
+        ValueError: If the value is not an IP address or network
+    """
+    value = value.strip()
+    try:
+        ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        raise ValueError(f"'{value}' is not a valid IP address or network")
+    return value
+
+
 class BlockIPRequest(BaseModel):
     """Request model for IP blocking."""
-    ip: str = Field(..., description="IP address to block", examples=["192.168.1.100"])
+    ip: str = Field(..., description="IP address or CIDR network to block", examples=["192.168.1.100"])
     reason: str = Field(default="Policy violation", description="Reason for blocking")
+    
+    @field_validator('ip')
+    @classmethod
+    def validate_ip(cls, v: str) -> str:
+        """Ensure the IP is a valid address or network."""
+        return _validate_ip(v)
+
+
+class BlockTargetRequest(BaseModel):
+    """Request model for domain blocking and unblocking by IP or domain."""
+    ip: str = Field(..., description="Domain or IP address", examples=["example.com"])
+    reason: str = Field(default="Policy violation", description="Reason for blocking")
+    
+    @field_validator('ip')
+    @classmethod
+    def validate_target(cls, v: str) -> str:
+        """Ensure the target is non-empty and contains no whitespace."""
+        target = v.strip()
+        if not target or any(c.isspace() or not c.isprintable() for c in target):
+            raise ValueError("Target must be a single domain or IP address")
+        return target
 
 
 class BlockIPResponse(BaseModel):
@@ -37,6 +119,29 @@ class BlockIPResponse(BaseModel):
     ip: str = Field(..., description="IP address that was processed")
 
 
+class BulkBlockRequest(BaseModel):
+    """Request model for blocking many IPs at once."""
+    ips: List[str] = Field(
+        ..., min_length=1, max_length=MAX_BULK_BLOCK_IPS,
+        description="IP addresses or CIDR networks to block", examples=[["192.168.1.100", "192.168.1.101"]]
+    )
+    reason: str = Field(default="Policy violation", description="Reason for blocking")
+    
+    @field_validator('ips')
+    @classmethod
+    def validate_ips(cls, v: List[str]) -> List[str]:
+        """Ensure every entry is a valid address or network."""
+        return [_validate_ip(ip) for ip in v]
+
+
+class BulkBlockResponse(BaseModel):
+    """Response model for bulk IP blocking."""
+    success: bool = Field(..., description="Whether at least one IP was blocked")
+    message: str = Field(..., description="Operation result message")
+    blocked: List[str] = Field(..., description="IP addresses that were blocked")
+    failed: List[str] = Field(..., description="IP addresses that failed, as 'ip: error'")
+
+
 @router.post(
     "/block",
     response_model=BlockIPResponse,
@@ -52,7 +157,7 @@ class BlockIPResponse(BaseModel):
     **Note**: This endpoint requires administrative privileges to modify firewall rules.
     """
 )
-async def block_ip(request: BlockIPRequest) -> BlockIPResponse:
+def block_ip(request: BlockIPRequest) -> BlockIPResponse:
     """
     Block an IP address using Windows Firewall.
     
@@ -73,33 +178,21 @@ async def block_ip(request: BlockIPRequest) -> BlockIPResponse:
                 detail="IP blocking is only supported on Windows systems"
             )
         
-        # Construct Windows Firewall command
-        rule_name = f"Block {request.ip} - {request.reason}"
-        command = [
-            'netsh', 'advfirewall', 'firewall', 'add', 'rule',
-            f'name={rule_name}',
-            'dir=out',
-            'action=block',
-            f'remoteip={request.ip}'
-        ]
+        rule_name = block_rule_name(request.ip, request.ip, request.reason)
         
         logger.info(f"Attempting to block IP {request.ip} for reason: {request.reason}")
         
-        # Execute firewall command
-        result = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
+        # Add the rule through the firewall worker (COM, or netsh fallback)
+        result = add_block_rules([(rule_name, request.ip)], timeout=10)
         
         if result.returncode == 0:
             logger.info(f"Successfully blocked IP {request.ip}")
-            return BlockIPResponse(
-                success=True,
-                message=f"IP {request.ip} has been blocked successfully",
-                ip=request.ip
-            )
+            _record_rules([(rule_name, request.ip, request.ip, request.reason)])
+            return ORJSONResponse({
+                "success": True,
+                "message": f"IP {request.ip} has been blocked successfully",
+                "ip": request.ip
+            })
         else:
             error_msg = result.stderr or "Unknown error occurred"
             logger.error(f"Failed to block IP {request.ip}: {error_msg}")
@@ -144,14 +237,14 @@ async def block_ip(request: BlockIPRequest) -> BlockIPResponse:
     **Note**: Resolves domain to IP addresses and blocks them via firewall.
     """
 )
-async def block_domain(request: BlockIPRequest) -> BlockIPResponse:
+def block_domain(request: BlockTargetRequest) -> BlockIPResponse:
     """
     Block access to a domain using Windows Firewall.
     
     Resolves the domain to IP addresses and creates firewall rules to block them.
     
     Args:
-        request: BlockIPRequest with domain in 'ip' field and reason
+        request: BlockTargetRequest with domain in 'ip' field and reason
         
     Returns:
         BlockIPResponse with operation result
@@ -166,15 +259,9 @@ async def block_domain(request: BlockIPRequest) -> BlockIPResponse:
         domain = request.ip  # Using 'ip' field for domain
         logger.info(f"Blocking domain {domain} for reason: {request.reason}")
         
-        # Resolve domain to IP addresses
+        # Resolve domain to IP addresses (cached, so repeat blocks skip DNS)
         try:
-            ip_addresses = []
-            # Try to get all IP addresses for the domain
-            addr_info = socket.getaddrinfo(domain, None)
-            for info in addr_info:
-                ip = info[4][0]
-                if ip not in ip_addresses:
-                    ip_addresses.append(ip)
+            ip_addresses = dns_cache.resolve(domain)
             
             if not ip_addresses:
                 logger.warning(f"Could not resolve domain {domain} to any IP addresses")
@@ -192,56 +279,57 @@ async def block_domain(request: BlockIPRequest) -> BlockIPResponse:
                 detail=f"Failed to resolve domain '{domain}': {str(e)}"
             )
         
-        # Block each resolved IP address
+        # Block every resolved IP address with one rule listing them all
+        # (remoteip accepts a comma-separated list), so the firewall holds and
+        # evaluates one rule per domain instead of one per address
         blocked_ips = []
         failed_ips = []
+        remote_ips = ",".join(ip_addresses)
+        rules = [(block_rule_name(domain, remote_ips, request.reason), remote_ips)]
         
-        for ip in ip_addresses:
-            rule_name = f"Block {domain} ({ip}) - {request.reason}"
-            command = [
-                'netsh', 'advfirewall', 'firewall', 'add', 'rule',
-                f'name={rule_name}',
-                'dir=out',
-                'action=block',
-                f'remoteip={ip}'
-            ]
+        try:
+            result = add_block_rules(rules)
             
-            try:
-                result = subprocess.run(command, capture_output=True, text=True, timeout=10)
-                
-                if result.returncode == 0:
-                    blocked_ips.append(ip)
-                    logger.info(f"Successfully blocked IP {ip} for domain {domain}")
-                else:
-                    error_msg = result.stderr.strip() or result.stdout.strip() or "Unknown error"
-                    failed_ips.append(f"{ip}: {error_msg}")
-                    logger.error(f"Failed to block IP {ip} for {domain}: {error_msg}")
-                    
-                    # Check for permission issues
-                    if "access is denied" in error_msg.lower() or "requested operation requires elevation" in error_msg.lower():
-                        raise HTTPException(
-                            status_code=status.HTTP_403_FORBIDDEN,
-                            detail="Insufficient privileges. Please run the backend as Administrator to manage firewall rules."
-                        )
+            if result.returncode != 0 and len(ip_addresses) > 1 and not _is_permission_error(result):
+                # The combined address list was rejected; retry one rule per IP
+                logger.warning(f"Combined block rule for {domain} failed, adding one rule per IP")
+                rules = [(block_rule_name(domain, ip, request.reason), ip) for ip in ip_addresses]
+                result = add_block_rules(rules)
             
-            except subprocess.TimeoutExpired:
-                failed_ips.append(f"{ip}: Timeout")
-                logger.error(f"Timeout blocking IP {ip} for domain {domain}")
+            if result.returncode == 0:
+                blocked_ips.extend(ip_addresses)
+                _record_rules([(name, domain, ip, request.reason) for name, ip in rules])
+                logger.info(f"Successfully blocked {len(ip_addresses)} IP(s) for domain {domain}")
+            else:
+                error_msg = result.stderr.strip() or result.stdout.strip() or "Unknown error"
+                failed_ips.extend(f"{ip}: {error_msg}" for ip in ip_addresses)
+                logger.error(f"Failed to block IPs for {domain}: {error_msg}")
+                
+                # Check for permission issues
+                if _is_permission_error(result):
+                    raise HTTPException(
+                        status_code=status.HTTP_403_FORBIDDEN,
+                        detail="Insufficient privileges. Please run the backend as Administrator to manage firewall rules."
+                    )
+        
+        except subprocess.TimeoutExpired:
+            failed_ips.extend(f"{ip}: Timeout" for ip in ip_addresses)
+            logger.error(f"Timeout blocking IPs for domain {domain}")
         
         # Return result based on success rate
         if blocked_ips and not failed_ips:
-            return BlockIPResponse(
-                success=True,
-                message=f"Domain {domain} blocked successfully ({len(blocked_ips)} IP(s) blocked)",
-                ip=domain
-            )
+            return ORJSONResponse({
+                "success": True,
+                "message": f"Domain {domain} blocked successfully ({len(blocked_ips)} IP(s) blocked)",
+                "ip": domain
+            })
         elif blocked_ips and failed_ips:
             logger.warning(f"Partially blocked {domain}: {len(blocked_ips)} succeeded, {len(failed_ips)} failed")
-            return BlockIPResponse(
-                success=True,
-                message=f"Partially blocked {domain}. {len(blocked_ips)} IP(s) blocked, {len(failed_ips)} failed.",
-                ip=domain
-            )
+            return ORJSONResponse({
+                "success": True,
+                "message": f"Partially blocked {domain}. {len(blocked_ips)} IP(s) blocked, {len(failed_ips)} failed.",
+                "ip": domain
+            })
         else:
             error_details = "; ".join(failed_ips)
             raise HTTPException(
@@ -259,18 +347,116 @@ async def block_domain(request: BlockIPRequest) -> BlockIPResponse:
         )
 
 
+@router.post(
+    "/block-bulk",
+    response_model=BulkBlockResponse,
+    status_code=status.HTTP_200_OK,
+    summary="Block many IP addresses",
+    description="""
+    Blocks up to 500 IP addresses in one firewall call, e.g. after a burst of alerts.
+    
+    **Requirements**:
+    - Must run as Administrator
+    - Windows operating system
+    
+    **Note**: All rules are added together, so the firewall applies the change once.
+    """
+)
+def block_ip_bulk(request: BulkBlockRequest) -> BulkBlockResponse:
+    """
+    Block many IP addresses using Windows Firewall.
+    
+    Args:
+        request: BulkBlockRequest containing IPs and reason
+        
+    Returns:
+        BulkBlockResponse with the blocked and failed IPs
+        
+    Raises:
+        HTTPException: If every IP fails or privileges are insufficient
+    """
+    try:
+        if platform.system() != "Windows":
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="IP blocking is only supported on Windows systems"
+            )
+        
+        ips = list(dict.fromkeys(request.ips))
+        logger.info(f"Attempting to block {len(ips)} IP(s) for reason: {request.reason}")
+        
+        failed = {}
+        try:
+            rule_names = {ip: block_rule_name(ip, ip, request.reason) for ip in ips}
+            result = add_block_rules(list(zip(rule_names.values(), ips)), timeout=30)
+            
+            if result.returncode != 0:
+                error_msg = result.stderr.strip() or result.stdout.strip() or "Unknown error"
+                logger.error(f"Failed to block IPs in bulk: {error_msg}")
+                
+                if "access is denied" in error_msg.lower() or "requested operation requires elevation" in error_msg.lower():
+                    raise HTTPException(
+                        status_code=status.HTTP_403_FORBIDDEN,
+                        detail="Insufficient privileges. Run as Administrator to manage firewall rules."
+                    )
+                
+                # The COM worker reports one "ip: error" line per failed rule;
+                # a failed netsh script can't be attributed, so it fails them all
+                for line in error_msg.splitlines():
+                    ip, sep, message = line.partition(": ")
+                    if sep and ip in ips:
+                        failed[ip] = message
+                if not failed:
+                    failed = dict.fromkeys(ips, error_msg)
+        
+        except subprocess.TimeoutExpired:
+            failed = dict.fromkeys(ips, "Timeout")
+            logger.error(f"Timeout blocking {len(ips)} IP(s) in bulk")
+        
+        blocked = [ip for ip in ips if ip not in failed]
+        failed_ips = [f"{ip}: {message}" for ip, message in failed.items()]
+        _record_rules([(rule_names[ip], ip, ip, request.reason) for ip in blocked])
+        
+        if not blocked:
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail=f"Failed to block IPs. Errors: {'; '.join(failed_ips)}"
+            )
+        
+        if failed_ips:
+            logger.warning(f"Partially blocked IPs: {len(blocked)} succeeded, {len(failed_ips)} failed")
+        else:
+            logger.info(f"Successfully blocked {len(blocked)} IP(s)")
+        
+        return ORJSONResponse({
+            "success": True,
+            "message": f"{len(blocked)} IP(s) blocked, {len(failed_ips)} failed",
+            "blocked": blocked,
+            "failed": failed_ips
+        })
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error blocking IPs in bulk: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to block IPs: {str(e)}"
+        )
+
+
 @router.post(
     "/unblock",
     status_code=status.HTTP_200_OK,
     summary="Unblock IP or domain",
     description="Remove a firewall block rule for an IP address or domain"
 )
-async def unblock_resource(request: BlockIPRequest):
+def unblock_resource(request: BlockTargetRequest):
     """
     Remove a firewall blocking rule.
     
     Args:
-        request: BlockIPRequest with IP/domain to unblock
+        request: BlockTargetRequest with IP/domain to unblock
         
     Returns:
         dict: Operation result
@@ -285,61 +471,64 @@ async def unblock_resource(request: BlockIPRequest):
         target = request.ip
         logger.info(f"Attempting to unblock {target}")
         
-        # First, get all firewall rules
-        show_command = [
-            'netsh', 'advfirewall', 'firewall', 'show', 'rule',
-            'name=all', 'dir=out'
-        ]
-        
-        result = subprocess.run(show_command, capture_output=True, text=True, timeout=15)
+        # Rules recorded for this target (digest names); the common case
+        # deletes these by name without listing every firewall rule
+        recorded = db.get_firewall_rule_names(target)
+        if recorded:
+            del_result = delete_rules(recorded)
+            if del_result.returncode == 0:
+                db.delete_firewall_rules(recorded)
+                logger.info(f"Successfully unblocked {target} ({len(recorded)} rule(s) deleted)")
+                return {
+                    "success": True,
+                    "message": f"Successfully unblocked {target} ({len(recorded)} rule(s) removed)",
+                    "target": target,
+                    "deleted_count": len(recorded)
+                }
+            # Some recorded rule is gone (e.g. removed by hand); find what's left
+            logger.warning(f"Deleting recorded rules for {target} failed, listing firewall rules")
         
-        if result.returncode != 0:
-            logger.error(f"Failed to list firewall rules: {result.stderr}")
+        # Otherwise, get the existing block rules
+        try:
+            existing_rules = list_block_rules(timeout=15)
+        except subprocess.CalledProcessError as e:
+            logger.error(f"Failed to list firewall rules: {e.stderr}")
             return {
                 "success": False,
                 "message": "Failed to list firewall rules",
                 "target": target
             }
         
-        # Parse output to find rules containing the target
-        rules_to_delete = []
-        lines = result.stdout.split('\n')
-        
-        for line in lines:
-            line = line.strip()
-            # Look for rule name lines
-            if line.startswith('Rule Name:'):
-                rule_name = line.split('Rule Name:', 1)[1].strip()
-                # Check if this rule is one of our blocking rules for this target
-                if 'Block' in rule_name and target in rule_name:
-                    rules_to_delete.append(rule_name)
+        # Find rules for the target; older rules carry the target in their
+        # name instead of being recorded
+        recorded = set(recorded)
+        rules_to_delete = list(dict.fromkeys(
+            rule_name for rule_name, _ in existing_rules
+            if rule_name in recorded or target in rule_name
+        ))
         
         if not rules_to_delete:
             logger.warning(f"No blocking rules found for {target}")
+            # Recorded rules no longer in the firewall are dropped
+            db.delete_firewall_rules(list(recorded))
             return {
                 "success": False,
                 "message": f"No blocking rule found for {target}",
                 "target": target
             }
         
-        # Delete each rule
+        # Delete all matching rules in a single netsh process
         deleted_count = 0
-        failed_count = 0
         
-        for rule_name in rules_to_delete:
-            delete_command = [
-                'netsh', 'advfirewall', 'firewall', 'delete', 'rule',
-                f'name={rule_name}'
-            ]
-            
-            del_result = subprocess.run(delete_command, capture_output=True, text=True, timeout=10)
-            
-            if del_result.returncode == 0:
-                deleted_count += 1
-                logger.info(f"Deleted firewall rule: {rule_name}")
-            else:
-                failed_count += 1
-                logger.error(f"Failed to delete rule '{rule_name}': {del_result.stderr}")
+        del_result = delete_rules(rules_to_delete)
+        
+        if del_result.returncode == 0:
+            deleted_count = len(rules_to_delete)
+            logger.info(f"Deleted firewall rules: {rules_to_delete}")
+            # Recorded rules no longer in the firewall are dropped as well
+            db.delete_firewall_rules(list(recorded))
+        else:
+            logger.error(f"Failed to delete rules {rules_to_delete}: {del_result.stderr}")
         
         if deleted_count > 0:
             logger.info(f"Successfully unblocked {target} ({deleted_count} rule(s) deleted)")
@@ -375,7 +564,7 @@ async def unblock_resource(request: BlockIPRequest):
     summary="List firewall blocking rules",
     description="Get list of all active firewall blocking rules created by this system"
 )
-async def list_blocking_rules():
+def list_blocking_rules():
     """
     List all blocking rules created by this system.
     
@@ -390,42 +579,24 @@ async def list_blocking_rules():
                 "message": "Firewall management only supported on Windows"
             }
         
-        # Show firewall rules with "Block" in the name
-        command = [
-            'netsh', 'advfirewall', 'firewall', 'show', 'rule',
-            'name=all', 'dir=out'
-        ]
-        
-        result = subprocess.run(command, capture_output=True, text=True, timeout=10)
-        
-        if result.returncode == 0:
-            # Parse output to find "Block" rules
-            rules = []
-            lines = result.stdout.split('\n')
-            current_rule = {}
-            
-            for line in lines:
-                line = line.strip()
-                if line.startswith('Rule Name:'):
-                    rule_name = line.split(':', 1)[1].strip()
-                    if 'Block' in rule_name:
-                        current_rule = {'name': rule_name}
-                elif line.startswith('RemoteIP:') and current_rule:
-                    current_rule['target'] = line.split(':', 1)[1].strip()
-                    rules.append(current_rule)
-                    current_rule = {}
-            
-            return {
-                "status": "success",
-                "rules": rules,
-                "count": len(rules)
-            }
-        else:
+        # Rules with "Block" in the name, read through COM or netsh
+        try:
+            rules = [
+                {'name': rule_name, 'target': remote_addresses}
+                for rule_name, remote_addresses in list_block_rules(timeout=10)
+            ]
+        except subprocess.CalledProcessError:
             return {
                 "status": "error",
                 "rules": [],
                 "message": "Failed to retrieve firewall rules"
             }
+        
+        return {
+            "status": "success",
+            "rules": rules,
+            "count": len(rules)
+        }
             
     except Exception as e:
         logger.error(f"Error listing rules: {str(e)}")
@@ -441,7 +612,7 @@ async def list_blocking_rules():
     summary="Get firewall status",
     description="Check if the firewall service is running and accessible."
 )
-async def get_firewall_status():
+def get_firewall_status():
     """Get current firewall status."""
     try:
         if platform.system() != "Windows":
@@ -4,22 +4,30 @@ Allows admin to configure allowed/blocked domains and view policy settings.
 """
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Dict, List, Optional
 import logging
-import json
 import os
+import threading
+
+import orjson
 
 from config import settings
 from database import db
+from utils.command_notifier import command_notifier
 from urllib.parse import urlparse
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
-# Session-only blocked domains (cleared every time the backend restarts)
+# Session-only blocked domains (cleared every time the backend restarts).
+# Keys of an insertion-ordered dict: O(1) membership and removal, and the
+# list endpoints still see domains in the order they were blocked.
 # ---------------------------------------------------------------------------
-_session_blocked_domains: list = []
+_session_blocked_domains: Dict[str, None] = {}
+
+# Handlers run on threadpool threads; held while checking and changing the list
+_session_blocked_lock = threading.Lock()
 
 
 def _normalize_domain(raw: str) -> str:
@@ -31,6 +39,32 @@ def _normalize_domain(raw: str) -> str:
         return host.rstrip('/').lower()
     return raw.lower()
 
+
+def _domain_suffixes(domain: str) -> List[str]:
+    """List a domain and its parent domains, most specific first (a.b.com, b.com, com)."""
+    labels = domain.rstrip('.').split('.')
+    return ['.'.join(labels[i:]) for i in range(len(labels))]
+
+
+def _match_domain(domain: str, domains) -> Optional[str]:
+    """
+    Find the most specific listed domain that a domain is, or is a subdomain of.
+    
+    Looks up each parent suffix (a.b.com, b.com, com) in the hashed list, so
+    the cost depends on the number of labels, not on how many domains are listed.
+    
+    Args:
+        domain: Normalized domain name
+        domains: Normalized domains supporting `in` (dict keys or set)
+    
+    Returns:
+        The matching listed domain, or None
+    """
+    for suffix in _domain_suffixes(domain):
+        if suffix in domains:
+            return suffix
+    return None
+
 # Create router
 router = APIRouter(
     prefix="/policy",
@@ -41,7 +75,7 @@ router = APIRouter(
     }
 )
 
-# Policy storage file (only persists allowed_domains)
+# Former policy file; allowed_domains now live in the domain_policies table
 POLICY_FILE = os.path.join(os.path.dirname(settings.DATABASE_PATH), "policies.json")
 
 
@@ -61,30 +95,27 @@ class PolicyListResponse(BaseModel):
     bandwidth_threshold_mb: int
 
 
-def load_policies() -> dict:
-    """Load persistent policies (allowed_domains only) from file.
-    blocked_domains are session-only and come from _session_blocked_domains."""
-    if os.path.exists(POLICY_FILE):
-        try:
-            with open(POLICY_FILE, 'r') as f:
-                data = json.load(f)
-                return {"allowed_domains": data.get("allowed_domains", [])}
-        except Exception as e:
-            logger.error(f"Error loading policies: {e}")
-    return {"allowed_domains": []}
-
-
-def save_policies(policies: dict):
-    """Save persistent policies (allowed_domains only) to file."""
+def import_policy_file():
+    """
+    Import allowed_domains from a policies.json written by older versions into
+    the domain_policies table. Called once at application startup.
+    
+    The file is only read, never modified; the database records that the
+    import ran, so domains removed later are not imported again.
+    """
+    if db.legacy_policy_import_done():
+        return
     try:
-        # Never persist blocked_domains — they are session-only
-        to_save = {"allowed_domains": policies.get("allowed_domains", [])}
-        with open(POLICY_FILE, 'w') as f:
-            json.dump(to_save, f, indent=2)
-        logger.info("Policies saved successfully")
+        domains = {}
+        if os.path.exists(POLICY_FILE):
+            with open(POLICY_FILE, 'rb') as f:
+                data = orjson.loads(f.read())
+            domains = dict.fromkeys(_normalize_domain(d) for d in data.get("allowed_domains") or [])
+        imported = db.import_legacy_policy_domains(list(domains))
+        if imported:
+            logger.info(f"Imported {imported} allowed domain(s) from {POLICY_FILE}")
     except Exception as e:
-        logger.error(f"Error saving policies: {e}")
-        raise
+        logger.error(f"Error importing policies from {POLICY_FILE}: {e}")
 
 
 @router.get(
@@ -93,7 +124,7 @@ def save_policies(policies: dict):
     summary="Get domain policies",
     description="Retrieve current allowed and blocked domain lists with policy settings"
 )
-async def get_domain_policies() -> PolicyListResponse:
+def get_domain_policies() -> PolicyListResponse:
     """
     Get current domain policies.
     
@@ -101,10 +132,8 @@ async def get_domain_policies() -> PolicyListResponse:
         PolicyListResponse: Current policy configuration
     """
     try:
-        policies = load_policies()
-        
         return PolicyListResponse(
-            allowed_domains=policies.get("allowed_domains", []),
+            allowed_domains=db.get_policy_domains("allowed"),
             blocked_domains=list(_session_blocked_domains),
             blocked_keywords=settings.BLOCKED_KEYWORDS,
             bandwidth_threshold_mb=settings.BANDWIDTH_THRESHOLD_MB
@@ -123,7 +152,7 @@ async def get_domain_policies() -> PolicyListResponse:
     summary="Add domain to block list",
     description="Add a domain to the blocked domains list and send block commands to all active students"
 )
-async def add_blocked_domain(domain_policy: DomainPolicy):
+def add_blocked_domain(domain_policy: DomainPolicy):
     """
     Add a domain to the blocked list and propagate to all students.
     
@@ -136,14 +165,18 @@ async def add_blocked_domain(domain_policy: DomainPolicy):
     try:
         domain = _normalize_domain(domain_policy.domain)
         
-        if domain in _session_blocked_domains:
+        with _session_blocked_lock:
+            already_blocked = domain in _session_blocked_domains
+            if not already_blocked:
+                _session_blocked_domains[domain] = None
+        
+        if already_blocked:
             return {
                 "success": False,
                 "message": f"Domain {domain} is already blocked",
                 "domain": domain
             }
         
-        _session_blocked_domains.append(domain)
         logger.info(f"Added {domain} to session blocked domains list")
         
         # Create global command for all active students
@@ -152,6 +185,7 @@ async def add_blocked_domain(domain_policy: DomainPolicy):
             domain=domain,
             reason=domain_policy.reason or "Admin policy enforcement"
         )
+        command_notifier.notify_all()  # Wake waiting agents' long-polls
         
         return {
             "success": True,
@@ -175,7 +209,7 @@ async def add_blocked_domain(domain_policy: DomainPolicy):
     summary="Add domain to allow list",
     description="Add a domain to the allowed domains list (whitelist) and send unblock commands to all active students"
 )
-async def add_allowed_domain(domain_policy: DomainPolicy):
+def add_allowed_domain(domain_policy: DomainPolicy):
     """
     Add a domain to the allowed list and unblock for all students.
     
@@ -186,14 +220,16 @@ async def add_allowed_domain(domain_policy: DomainPolicy):
         dict: Operation result with global command status
     """
     try:
-        policies = load_policies()
-        
-        if "allowed_domains" not in policies:
-            policies["allowed_domains"] = []
-        
         domain = _normalize_domain(domain_policy.domain)
         
-        if domain in policies["allowed_domains"]:
+        # One row insert; a domain already on the list inserts nothing
+        added = db.add_policy_domains(
+            [domain],
+            "allowed",
+            reason=domain_policy.reason,
+            added_by=domain_policy.added_by
+        )
+        if not added:
             return {
                 "success": False,
                 "message": f"Domain {domain} is already allowed",
@@ -201,15 +237,13 @@ async def add_allowed_domain(domain_policy: DomainPolicy):
             }
         
         # Remove from session blocked list if present
-        was_blocked = False
-        if domain in _session_blocked_domains:
-            _session_blocked_domains.remove(domain)
-            was_blocked = True
+        with _session_blocked_lock:
+            was_blocked = domain in _session_blocked_domains
+            if was_blocked:
+                del _session_blocked_domains[domain]
+        if was_blocked:
             logger.info(f"Removed {domain} from session blocked list")
         
-        policies["allowed_domains"].append(domain)
-        save_policies(policies)
-        
         logger.info(f"Added {domain} to allowed domains list")
         
         # Create global unblock command for all active students
@@ -220,12 +254,13 @@ async def add_allowed_domain(domain_policy: DomainPolicy):
                 domain=domain,
                 reason=domain_policy.reason or "Admin policy change - domain allowed"
             )
+            command_notifier.notify_all()  # Wake waiting agents' long-polls
         
         return {
             "success": True,
             "message": f"Domain {domain} added to allow list",
             "domain": domain,
-            "total_allowed": len(policies["allowed_domains"]),
+            "total_allowed": db.count_policy_domains("allowed"),
             "was_blocked": was_blocked,
             "global_command": command_result
         }
@@ -243,7 +278,7 @@ async def add_allowed_domain(domain_policy: DomainPolicy):
     summary="Remove domain from policies",
     description="Remove a domain from both allowed and blocked lists and send unblock commands to all students"
 )
-async def remove_domain_policy(domain: str):
+def remove_domain_policy(domain: str):
     """
     Remove a domain from all policy lists and unblock for all students.
     
@@ -254,28 +289,23 @@ async def remove_domain_policy(domain: str):
         dict: Operation result with global command status
     """
     try:
-        policies = load_policies()
         # Normalize: strip protocol so 'https://chatgpt.com' matches stored 'chatgpt.com'
         domain = _normalize_domain(domain)
         removed_from = []
         
-        # Check allowed_domains (file-persisted)
-        allowed = policies.get("allowed_domains", [])
-        allowed_matches = [d for d in allowed if _normalize_domain(d) == domain]
-        for m in allowed_matches:
-            allowed.remove(m)
+        # Check allowed domains (persisted in the database, stored normalized)
+        if db.remove_policy_domain(domain):
             removed_from.append("allowed")
 
-        # Check session-blocked list (in-memory)
-        was_blocked = False
-        blocked_matches = [d for d in list(_session_blocked_domains) if _normalize_domain(d) == domain]
-        for m in blocked_matches:
-            _session_blocked_domains.remove(m)
+        # Check session-blocked list (in-memory; keys are stored normalized)
+        with _session_blocked_lock:
+            was_blocked = domain in _session_blocked_domains
+            if was_blocked:
+                del _session_blocked_domains[domain]
+        if was_blocked:
             removed_from.append("blocked")
-            was_blocked = True
         
         if removed_from:
-            save_policies(policies)
             logger.info(f"Removed {domain} from {', '.join(removed_from)} lists")
             
             # Create global unblock command if domain was blocked
@@ -286,6 +316,7 @@ async def remove_domain_policy(domain: str):
                     domain=domain,
                     reason="Admin removed domain from block list"
                 )
+                command_notifier.notify_all()  # Wake waiting agents' long-polls
             
             return {
                 "success": True,
@@ -314,7 +345,7 @@ async def remove_domain_policy(domain: str):
     summary="Get policy summary",
     description="Get summary of current policy configuration"
 )
-async def get_policy_summary():
+def get_policy_summary():
     """
     Get summary statistics of current policies.
     
@@ -322,10 +353,8 @@ async def get_policy_summary():
         dict: Policy summary with counts and settings
     """
     try:
-        policies = load_policies()
-        
         return {
-            "allowed_domains_count": len(policies.get("allowed_domains", [])),
+            "allowed_domains_count": db.count_policy_domains("allowed"),
             "blocked_domains_count": len(_session_blocked_domains),
             "blocked_keywords_count": len(settings.BLOCKED_KEYWORDS),
             "bandwidth_threshold_mb": settings.BANDWIDTH_THRESHOLD_MB,
@@ -338,3 +367,53 @@ async def get_policy_summary():
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get policy summary: {str(e)}"
         )
+
+
+@router.get(
+    "/check/{domain}",
+    summary="Check a domain against policies",
+    description="""
+    Report whether a domain is blocked or allowed by the current policies.
+    
+    A listed domain also covers its subdomains (blocking `facebook.com`
+    blocks `m.facebook.com`). When both lists match, the more specific
+    entry decides; an exact tie is reported as blocked.
+    """
+)
+def check_domain_policy(domain: str):
+    """
+    Check a domain against the blocked and allowed lists.
+    
+    Args:
+        domain: Domain name to check
+        
+    Returns:
+        dict: Policy status ("blocked", "allowed" or "unlisted") and the matching entries
+    """
+    try:
+        domain = _normalize_domain(domain)
+        # Only the domain's own suffixes are looked up in the allow list
+        allowed = db.find_policy_domains(_domain_suffixes(domain), "allowed")
+        allowed_match = _match_domain(domain, frozenset(allowed))
+        blocked_match = _match_domain(domain, _session_blocked_domains)
+        
+        if blocked_match and (not allowed_match or len(blocked_match) >= len(allowed_match)):
+            policy = "blocked"
+        elif allowed_match:
+            policy = "allowed"
+        else:
+            policy = "unlisted"
+        
+        return {
+            "domain": domain,
+            "policy": policy,
+            "blocked_match": blocked_match,
+            "allowed_match": allowed_match
+        }
+        
+    except Exception as e:
+        logger.error(f"Error checking domain policy: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to check domain policy: {str(e)}"
+        )
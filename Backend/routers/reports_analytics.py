@@ -53,7 +53,7 @@ router = APIRouter(
 # ============================================
 
 @router.get("/summary")
-async def get_analytics_summary() -> Dict[str, Any]:
+def get_analytics_summary() -> Dict[str, Any]:
     """
     Get summary analytics for the dashboard.
     
@@ -99,7 +99,7 @@ async def get_analytics_summary() -> Dict[str, Any]:
 
 
 @router.get("/charts/network")
-async def get_network_charts() -> Dict[str, Any]:
+def get_network_charts() -> Dict[str, Any]:
     """
     Get network usage data formatted for frontend charts.
     
@@ -136,7 +136,7 @@ async def get_network_charts() -> Dict[str, Any]:
 
 
 @router.get("/charts/alerts")
-async def get_alert_charts() -> Dict[str, Any]:
+def get_alert_charts() -> Dict[str, Any]:
     """
     Get alerts data formatted for frontend charts.
     
@@ -176,7 +176,7 @@ async def get_alert_charts() -> Dict[str, Any]:
 # ============================================
 
 @router.get("/reports/weekly")
-async def get_weekly_report() -> Dict[str, Any]:
+def get_weekly_report() -> Dict[str, Any]:
     """
     Get comprehensive weekly report.
     
@@ -212,7 +212,7 @@ async def get_weekly_report() -> Dict[str, Any]:
 
 
 @router.get("/reports/weekly/csv")
-async def download_weekly_report_csv():
+def download_weekly_report_csv():
     """
     Download weekly report as CSV file.
     
@@ -116,7 +116,7 @@ class ScheduleEnforcementStatusUpdate(BaseModel):
 # ============================================================================
 
 @router.get("/blocks", response_model=List[ScheduledBlockResponse])
-async def get_all_scheduled_blocks(
+def get_all_scheduled_blocks(
     active_only: bool = False,
     website: Optional[str] = None
 ):
@@ -128,7 +128,7 @@ async def get_all_scheduled_blocks(
     - website: Filter by website/domain
     """
     try:
-        with db.get_connection() as conn:
+        with db.get_read_connection() as conn:
             cursor = conn.cursor()
             
             query = "SELECT * FROM scheduled_blocks WHERE 1=1"
@@ -171,7 +171,7 @@ async def get_all_scheduled_blocks(
 
 
 @router.get("/blocks/active-now", response_model=List[ActiveBlockInfo])
-async def get_currently_active_blocks():
+def get_currently_active_blocks():
     """
     Get all blocks that are currently active based on current time and day.
     Used by student agents to check what websites are blocked right now.
@@ -181,7 +181,7 @@ async def get_currently_active_blocks():
         current_time = now.strftime("%H:%M")
         current_day = now.weekday()  # 0 = Monday, 6 = Sunday
         
-        with db.get_connection() as conn:
+        with db.get_read_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -224,10 +224,10 @@ async def get_currently_active_blocks():
 
 
 @router.get("/blocks/{block_id}", response_model=ScheduledBlockResponse)
-async def get_scheduled_block(block_id: int):
+def get_scheduled_block(block_id: int):
     """Get a specific scheduled block by ID."""
     try:
-        with db.get_connection() as conn:
+        with db.get_read_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute("""
@@ -265,7 +265,7 @@ async def get_scheduled_block(block_id: int):
 
 
 @router.post("/blocks", response_model=ScheduledBlockResponse, status_code=status.HTTP_201_CREATED)
-async def create_scheduled_block(block: ScheduledBlockCreate):
+def create_scheduled_block(block: ScheduledBlockCreate):
     """
     Create a new scheduled block.
     Admin only - requires authentication.
@@ -332,7 +332,7 @@ async def create_scheduled_block(block: ScheduledBlockCreate):
 
 
 @router.put("/blocks/{block_id}", response_model=ScheduledBlockResponse)
-async def update_scheduled_block(block_id: int, block: ScheduledBlockUpdate):
+def update_scheduled_block(block_id: int, block: ScheduledBlockUpdate):
     """
     Update an existing scheduled block.
     Admin only - requires authentication.
@@ -424,7 +424,7 @@ async def update_scheduled_block(block_id: int, block: ScheduledBlockUpdate):
 
 
 @router.delete("/blocks/{block_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_scheduled_block(block_id: int):
+def delete_scheduled_block(block_id: int):
     """
     Delete a scheduled block.
     Admin only - requires authentication.
@@ -453,7 +453,7 @@ async def delete_scheduled_block(block_id: int):
 
 
 @router.post("/blocks/{block_id}/toggle", response_model=ScheduledBlockResponse)
-async def toggle_scheduled_block(block_id: int):
+def toggle_scheduled_block(block_id: int):
     """
     Toggle a scheduled block's active status.
     Convenience endpoint for enabling/disabling schedules.
@@ -517,7 +517,7 @@ async def health_check():
 
 
 @router.post("/status")
-async def report_schedule_status(payload: ScheduleEnforcementStatusUpdate):
+def report_schedule_status(payload: ScheduleEnforcementStatusUpdate):
     """Receive latest schedule enforcement state from a student agent."""
     try:
         db.upsert_schedule_enforcement_status(
@@ -540,7 +540,7 @@ async def report_schedule_status(payload: ScheduleEnforcementStatusUpdate):
 
 
 @router.get("/status")
-async def get_schedule_status(limit: int = 100):
+def get_schedule_status(limit: int = 100):
     """Return latest schedule enforcement state for student agents."""
     try:
         return {
@@ -10,7 +10,6 @@ from models import WeeklyStatsResponse
 from stats import stats_engine
 
 # Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create router
@@ -41,7 +40,7 @@ router = APIRouter(
     The statistics cover the last 7 days from the current time.
     """
 )
-async def get_weekly_statistics() -> WeeklyStatsResponse:
+def get_weekly_statistics() -> WeeklyStatsResponse:
     """
     Calculate and return weekly statistics.
     
@@ -84,7 +83,7 @@ async def get_weekly_statistics() -> WeeklyStatsResponse:
     - Average bandwidth per student
     """
 )
-async def get_bandwidth_summary() -> Dict[str, Any]:
+def get_bandwidth_summary() -> Dict[str, Any]:
     """
     Get simplified bandwidth statistics.
     
@@ -121,7 +120,7 @@ async def get_bandwidth_summary() -> Dict[str, Any]:
     Useful for quick dashboard widgets showing alert status.
     """
 )
-async def get_alerts_summary() -> Dict[str, Any]:
+def get_alerts_summary() -> Dict[str, Any]:
     """
     Get alert statistics summary.
     
@@ -158,7 +157,7 @@ async def get_alerts_summary() -> Dict[str, Any]:
     Returns up to 10 hosts sorted by total bandwidth usage.
     """
 )
-async def get_top_consumers() -> Dict[str, Any]:
+def get_top_consumers() -> Dict[str, Any]:
     """
     Get top bandwidth consumers.
     
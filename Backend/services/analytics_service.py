@@ -36,11 +36,9 @@ def calculate_summary() -> Dict[str, Any]:
         activities = db.get_recent_activities(limit=1000)
         alerts = db.get_recent_alerts(limit=100)
         
-        # Calculate bandwidth metrics
-        total_bandwidth_mb = 0
-        for activity in activities:
-            bytes_total = activity.get('bytes_sent', 0) + activity.get('bytes_recv', 0)
-            total_bandwidth_mb += bytes_total / (1024 * 1024)
+        # Calculate bandwidth metrics: one exact integer sum, converted once
+        total_bytes = sum(a.get('bytes_sent', 0) + a.get('bytes_recv', 0) for a in activities)
+        total_bandwidth_mb = total_bytes / (1024 * 1024)
         
         # Get unique students
         unique_students = len(set(a['student_id'] for a in activities if a.get('student_id')))
@@ -139,8 +137,7 @@ def get_network_chart_data() -> Dict[str, Any]:
         hourly_data = defaultdict(float)
         for activity in activities:
             try:
-                timestamp = datetime.fromisoformat(activity['timestamp'])
-                hour = timestamp.hour
+                hour = int(activity['timestamp'][11:13])  # HH of YYYY-MM-DDTHH:MM
                 bytes_total = activity.get('bytes_sent', 0) + activity.get('bytes_recv', 0)
                 bandwidth_mb = bytes_total / (1024 * 1024)
                 hourly_data[hour] += bandwidth_mb
@@ -192,7 +192,7 @@ def _generate_network_section(activities: List[Dict]) -> Dict[str, Any]:
     hourly_usage = defaultdict(float)
     for activity in activities:
         try:
-            hour = datetime.fromisoformat(activity["timestamp"]).hour
+            hour = int(activity["timestamp"][11:13])  # HH of YYYY-MM-DDTHH:MM
             hourly_usage[hour] += activity["bandwidth_used"]
         except:
             pass
@@ -4,6 +4,10 @@ Run this after starting the server to ensure everything works.
 """
 import requests
 import json
+import os
+import tempfile
+import threading
+import time
 from datetime import datetime
 
 # Configuration
@@ -172,6 +176,189 @@ def test_alerts_summary():
     assert response.status_code == 200, "Get alerts summary failed"
     print("✓ Alerts summary passed")
 
+def test_detector_domain_checks():
+    """Test policy file subdomain blocking and domain finding order in the detector."""
+    print_section("Testing Detector Domain Checks")
+    
+    # Runs in-process against a temporary policy file; no server needed
+    from alerts import PolicyViolationDetector
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        detector = PolicyViolationDetector()
+        detector._blocked_domains_path = os.path.join(tmp, "policies.json")
+        with open(detector._blocked_domains_path, "w") as f:
+            json.dump({"blocked_domains": ["blocked-site.com"]}, f)
+        
+        # A blocked domain covers its subdomains, but not lookalike names
+        for domain, violation in (("blocked-site.com", True), ("cdn.blocked-site.com", True),
+                                  ("notblocked-site.com", False), ("blocked-site.com.example", False)):
+            result = detector._check_suspicious_domains([{"domain": domain}])
+            print(f"{domain}: {result}")
+            assert result['violation'] == violation, f"Wrong verdict for {domain}"
+        
+        # Findings are deduplicated and reported in destination order
+        destinations = [{"domain": domain} for domain in (
+            "vpn-gate.net", "a.blocked-site.com", "vpn-gate.net", "torrent-index.org", "crack-tools.io"
+        )]
+        result = detector._check_suspicious_domains(destinations)
+        print(f"Reason: {result['reason']}")
+        assert result['reason'] == (
+            "Suspicious/blocked domain access detected: "
+            "vpn-gate.net, a.blocked-site.com (blocked policy), torrent-index.org (+1 more)"
+        ), "Findings should be distinct and in destination order"
+    
+    print("✓ Detector domain checks passed")
+
+def _ndjson(samples):
+    """Encode activity samples as one JSON object per line."""
+    return "\n".join(json.dumps(sample) for sample in samples) + "\n"
+
+def test_activity_batch():
+    """Test NDJSON batch activity submission."""
+    print_section("Testing Batch Activity Submission")
+    
+    headers = {"Content-Type": "application/x-ndjson"}
+    samples = [
+        {
+            "hostname": f"BATCH{i:02d}",
+            "bytes_sent": 1024 * i,
+            "bytes_recv": 2048 * i,
+            "processes": ["chrome.exe"]
+        }
+        for i in range(3)
+    ]
+    
+    # Blank lines between samples are ignored
+    response = requests.post(f"{BASE_URL}/activity/batch", data=_ndjson(samples) + "\n", headers=headers)
+    print(f"Status Code: {response.status_code}")
+    print(f"Response: {json.dumps(response.json(), indent=2)}")
+    
+    assert response.status_code == 201, "Batch submission failed"
+    result = response.json()
+    assert result['inserted'] == 3, "Batch should insert every sample"
+    assert len(result['activity_ids']) == 3, "Batch should return one ID per sample"
+    
+    # A line that is not a valid activity rejects the whole batch
+    bad_body = _ndjson(samples[:1]) + '{"hostname": "BATCHBAD"}\n'
+    response = requests.post(f"{BASE_URL}/activity/batch", data=bad_body, headers=headers)
+    print(f"Invalid line - Status Code: {response.status_code}")
+    assert response.status_code == 422, "Invalid line should be rejected"
+    assert "line 2" in response.json()['detail'], "Error should name the invalid line"
+    
+    # A body with no samples is rejected
+    response = requests.post(f"{BASE_URL}/activity/batch", data="\n\n", headers=headers)
+    print(f"Empty batch - Status Code: {response.status_code}")
+    assert response.status_code == 422, "Empty batch should be rejected"
+    
+    # More than 1000 samples is rejected
+    response = requests.post(f"{BASE_URL}/activity/batch", data=_ndjson(samples[:1] * 1001), headers=headers)
+    print(f"Oversized batch - Status Code: {response.status_code}")
+    assert response.status_code == 413, "Oversized batch should be rejected"
+    
+    print("✓ Batch activity submission passed")
+
+def test_commands_long_poll():
+    """Test that a waiting command poll wakes when an admin blocks a domain."""
+    print_section("Testing Command Long-Poll")
+    
+    student_id = f"LONGPOLL-{datetime.now().strftime('%H%M%S')}"
+    
+    # Drain anything already queued so the poll below has to wait
+    requests.get(f"{BASE_URL}/commands", params={"student_id": student_id})
+    
+    block = threading.Timer(1.0, requests.post, args=(f"{BASE_URL}/admin/block-domain",), kwargs={
+        "json": {"student_id": student_id, "domain": "longpoll-test.com", "reason": "API test"}
+    })
+    block.start()
+    started = time.monotonic()
+    try:
+        response = requests.get(f"{BASE_URL}/commands", params={"student_id": student_id, "wait": 10})
+    finally:
+        block.join()
+    elapsed = time.monotonic() - started
+    print(f"Status Code: {response.status_code} after {elapsed:.1f}s")
+    print(f"Response: {json.dumps(response.json(), indent=2)}")
+    
+    assert response.status_code == 200, "Get commands failed"
+    assert elapsed < 10, "Long-poll should return when the command is queued, not at the timeout"
+    commands = response.json()['commands']
+    assert any(cmd['action'] == "BLOCK_DOMAIN" and cmd['domain'] == "longpoll-test.com" for cmd in commands), \
+        "Long-poll should deliver the block command"
+    
+    print("✓ Command long-poll passed")
+
+def test_policy_check():
+    """Test domain policy lookup, including subdomains and precedence."""
+    print_section("Testing Domain Policy Check")
+    
+    suffix = datetime.now().strftime("%H%M%S")
+    blocked = f"policy-test-{suffix}.com"
+    allowed = f"safe.{blocked}"
+    tie = f"tie-test-{suffix}.org"
+    
+    requests.post(f"{BASE_URL}/policy/domains/block", json={"domain": blocked, "policy": "blocked"})
+    requests.post(f"{BASE_URL}/policy/domains/allow", json={"domain": allowed, "policy": "allowed"})
+    # Allow first: blocking afterwards leaves the domain on both lists
+    requests.post(f"{BASE_URL}/policy/domains/allow", json={"domain": tie, "policy": "allowed"})
+    requests.post(f"{BASE_URL}/policy/domains/block", json={"domain": tie, "policy": "blocked"})
+    
+    try:
+        expected = {
+            f"www.{blocked}": ("blocked", blocked, None),        # Subdomain of a blocked entry
+            f"a.{allowed}": ("allowed", blocked, allowed),       # More specific allow wins
+            tie: ("blocked", tie, tie),                         # Exact tie is reported as blocked
+            f"unrelated-{suffix}.net": ("unlisted", None, None)
+        }
+        for domain, (policy, blocked_match, allowed_match) in expected.items():
+            response = requests.get(f"{BASE_URL}/policy/check/{domain}")
+            print(f"{domain}: {response.json()}")
+            assert response.status_code == 200, "Policy check failed"
+            result = response.json()
+            assert result['policy'] == policy, f"{domain} should be {policy}"
+            assert result['blocked_match'] == blocked_match, f"Wrong blocked match for {domain}"
+            assert result['allowed_match'] == allowed_match, f"Wrong allowed match for {domain}"
+    finally:
+        for domain in (blocked, allowed, tie):
+            requests.delete(f"{BASE_URL}/policy/domains/{domain}")
+    
+    print("✓ Domain policy check passed")
+
+def test_admin_activities_limit():
+    """Test bounds on the recent activities limit."""
+    print_section("Testing Admin Activities Limit")
+    
+    response = requests.get(f"{BASE_URL}/admin/activities", params={"limit": 2})
+    print(f"limit=2 - Status Code: {response.status_code}")
+    assert response.status_code == 200, "Get recent activities failed"
+    assert len(response.json()) <= 2, "Limit should cap the number of records"
+    
+    for limit in (0, -1, 1001):
+        response = requests.get(f"{BASE_URL}/admin/activities", params={"limit": limit})
+        print(f"limit={limit} - Status Code: {response.status_code}")
+        assert response.status_code == 422, f"limit={limit} should be rejected"
+    
+    print("✓ Admin activities limit passed")
+
+def test_firewall_block_bulk():
+    """Test bulk IP blocking input validation."""
+    print_section("Testing Firewall Bulk Block")
+    
+    # Every entry must be an IP address or CIDR network
+    for ips in (["192.168.1.100", "not-an-ip"], ["10.0.0.1 any"], ["10.0.0.1\r\nfirewall reset"]):
+        response = requests.post(f"{BASE_URL}/firewall/block-bulk", json={"ips": ips})
+        print(f"{ips!r} - Status Code: {response.status_code}")
+        assert response.status_code == 422, f"Invalid entry {ips!r} should be rejected"
+    
+    # Valid input is only acted on where Windows Firewall is available
+    response = requests.post(
+        f"{BASE_URL}/firewall/block-bulk",
+        json={"ips": ["192.0.2.10", "198.51.100.0/24"], "reason": "API test"}
+    )
+    print(f"Valid entries - Status Code: {response.status_code}")
+    assert response.status_code in (200, 501), "Valid entries should pass validation"
+    
+    print("✓ Firewall bulk block passed")
+
 def main():
     """Run all tests."""
     print(f"\n{'#'*60}")
@@ -204,6 +391,24 @@ def main():
         test_bandwidth_summary()
         test_alerts_summary()
         
+        # Test detector domain checks
+        test_detector_domain_checks()
+        
+        # Test batch activity submission
+        test_activity_batch()
+        
+        # Test command long-polling
+        test_commands_long_poll()
+        
+        # Test domain policy check
+        test_policy_check()
+        
+        # Test admin activities limit
+        test_admin_activities_limit()
+        
+        # Test firewall bulk block validation
+        test_firewall_block_bulk()
+        
         # Final summary
         print_section("ALL TESTS PASSED ✓")
         print("The backend is working correctly!")
@@ -0,0 +1,83 @@
+"""
+Command notification utilities.
+Wakes long-polling GET /commands requests as soon as a command is queued for their student.
+"""
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Tuple
+
+
+class CommandNotifier:
+    """Per-student wake-up events for command long-polls, capped as an LRU."""
+
+    def __init__(self, max_students: int = 4096):
+        """
+        Initialize the notifier.
+
+        Args:
+            max_students: Most students tracked at once; the least recently
+                polled student's event is dropped beyond this
+        """
+        self.max_students = max_students
+        self._events: "OrderedDict[str, Tuple[asyncio.AbstractEventLoop, asyncio.Event]]" = OrderedDict()
+        # Commands are queued from threadpool workers as well as the event loop
+        self._lock = threading.Lock()
+
+    def listen(self, student_id: str) -> asyncio.Event:
+        """
+        Get a cleared event that is set when a command is queued for a student.
+
+        Call this from the event loop before checking for pending commands, so
+        a command queued between the check and the wait is not missed.
+
+        Args:
+            student_id: Student hostname/ID
+
+        Returns:
+            asyncio.Event: Event bound to the running loop
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            entry = self._events.get(student_id)
+            if entry is None or entry[0] is not loop:
+                entry = (loop, asyncio.Event())
+                self._events[student_id] = entry
+                if len(self._events) > self.max_students:
+                    # An evicted student's open poll simply runs to its timeout
+                    self._events.popitem(last=False)
+            else:
+                self._events.move_to_end(student_id)
+        entry[1].clear()
+        return entry[1]
+
+    def notify(self, student_id: str):
+        """
+        Wake any long-poll waiting on a student. Safe to call from any thread.
+
+        Args:
+            student_id: Student hostname/ID
+        """
+        with self._lock:
+            entry = self._events.get(student_id)
+        if entry is not None:
+            self._wake(*entry)
+
+    def notify_all(self):
+        """Wake every waiting long-poll, e.g. after a command for all students."""
+        with self._lock:
+            entries = list(self._events.values())
+        for loop, event in entries:
+            self._wake(loop, event)
+
+    @staticmethod
+    def _wake(loop: asyncio.AbstractEventLoop, event: asyncio.Event):
+        """Set an event on its own loop, from whichever thread we are on."""
+        try:
+            loop.call_soon_threadsafe(event.set)
+        except RuntimeError:
+            pass  # Loop already closed (shutdown); nobody is waiting
+
+
+# Global command notifier instance
+command_notifier = CommandNotifier()
@@ -0,0 +1,86 @@
+"""
+DNS cache utilities.
+Keeps resolved IP addresses per domain so repeated firewall blocks skip the resolver.
+"""
+import socket
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Tuple
+
+
+class DNSCache:
+    """In-process TTL cache of domain -> IP address lists, capped as an LRU."""
+
+    def __init__(self, ttl_seconds: float = 300.0, stale_grace_seconds: float = 600.0,
+                 max_entries: int = 1024):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl_seconds: Seconds a resolution is served before re-resolving
+            stale_grace_seconds: Seconds past expiry an entry may still be
+                served when re-resolving fails
+            max_entries: Most domains kept; the least recently used is dropped
+        """
+        self.ttl_seconds = ttl_seconds
+        self.stale_grace_seconds = stale_grace_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[List[str], float]]" = OrderedDict()
+        # Handlers resolving domains run on threadpool workers
+        self._lock = threading.Lock()
+
+    def resolve(self, domain: str) -> List[str]:
+        """
+        Resolve a domain to its unique IP addresses, using the cache when fresh.
+
+        The resolver is called without holding the lock, so lookups for
+        different domains do not wait on each other.
+
+        Args:
+            domain: Domain name to resolve
+
+        Returns:
+            List of IP addresses in resolver order (may be empty)
+
+        Raises:
+            socket.gaierror: If resolution fails and no usable stale entry exists
+        """
+        key = domain.lower()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and now < entry[1]:
+                self._entries.move_to_end(key)
+                return list(entry[0])
+
+        try:
+            addr_info = socket.getaddrinfo(domain, None, type=socket.SOCK_STREAM)
+        except socket.gaierror:
+            # Ride out a transient resolver failure on the last good answer
+            if entry is not None and now < entry[1] + self.stale_grace_seconds:
+                return list(entry[0])
+            raise
+
+        ip_addresses = list(dict.fromkeys(info[4][0] for info in addr_info))
+        if ip_addresses:
+            with self._lock:
+                self._entries[key] = (ip_addresses, time.monotonic() + self.ttl_seconds)
+                self._entries.move_to_end(key)
+                if len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return list(ip_addresses)
+
+    def invalidate(self, domain: str):
+        """
+        Drop a domain so the next lookup goes to the resolver.
+
+        Args:
+            domain: Domain name
+        """
+        with self._lock:
+            self._entries.pop(domain.lower(), None)
+
+
+# Global DNS cache instance
+dns_cache = DNSCache()
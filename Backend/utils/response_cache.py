@@ -0,0 +1,83 @@
+"""
+Response cache utilities.
+Keeps short-lived, pre-serialized JSON responses with ETags for polled endpoints.
+"""
+import hashlib
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import orjson
+
+
+# Cache key for the admin dashboard's /admin/logs payload
+ADMIN_LOGS_KEY = "admin:logs:v1"
+
+
+class ResponseCache:
+    """In-process TTL cache of serialized JSON bodies keyed by name."""
+
+    def __init__(self, ttl_seconds: float = 3.0):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl_seconds: Seconds an entry is served before it is rebuilt
+        """
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[str, Tuple[bytes, str, float]] = {}
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """
+        Get a cached response.
+
+        Args:
+            key: Cache key
+
+        Returns:
+            (body, etag) tuple, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() >= entry[2]:
+            return None
+        return entry[0], entry[1]
+
+    def set(self, key: str, payload: Any) -> Tuple[bytes, str]:
+        """
+        Serialize a payload and cache it.
+
+        Args:
+            key: Cache key
+            payload: JSON-serializable response payload
+
+        Returns:
+            (body, etag) tuple for the stored response
+        """
+        return self.set_body(key, orjson.dumps(payload))
+
+    def set_body(self, key: str, body: bytes) -> Tuple[bytes, str]:
+        """
+        Cache an already-serialized JSON body.
+
+        Args:
+            key: Cache key
+            body: Serialized JSON body
+
+        Returns:
+            (body, etag) tuple for the stored response
+        """
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        self._entries[key] = (body, etag, time.monotonic() + self.ttl_seconds)
+        return body, etag
+
+    def invalidate(self, key: str):
+        """
+        Drop a cached response so the next request rebuilds it.
+
+        Args:
+            key: Cache key
+        """
+        self._entries.pop(key, None)
+
+
+# Global response cache instance
+response_cache = ResponseCache()